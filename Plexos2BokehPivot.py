@@ -1,33 +1,69 @@
 import os
+import argparse
 import traceback
-import clr
 import sys
 import csv
 import pandas as pd
+import numpy as np
 import concurrent.futures
 import zipfile
 from xml.etree import ElementTree as ET
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import io
+import zlib
+import glob
 import json
 import re
+import time
+from manifest import (MANIFEST_FILE, empty_manifest, is_up_to_date, load_manifest, output_key, output_record, save_manifest,
+                      solution_fingerprint, solution_key, update_manifest)
+from output_files import append_frame, append_output, check_csv_header, concat_outputs, open_table_writer, write_output
+from solution_reader import ZipSolution, find_solution_xml, parse_datetimes, scan_period_datetimes, split_datetimes
 
-# Load PLEXOS assemblies
+# Load PLEXOS assemblies. Without pythonnet or the PLEXOS API (e.g. on Linux worker nodes)
+# only the 'zip' backend, which reads solution zips directly, is available.
 plexos_path = 'C:/Program Files/Energy Exemplar/PLEXOS 10.0 API'
-sys.path.append(plexos_path)
-clr.AddReference('PLEXOS_NET.Core')
-clr.AddReference('EEUTILITY')
-clr.AddReference('EnergyExemplar.PLEXOS.Utility')
-clr.AddReference('PLEXOSCommon')
-
-# Import from .NET assemblies (both PLEXOS and system)
-from PLEXOS_NET.Core import *
-from EEUTILITY.Enums import *
-from EnergyExemplar.PLEXOS.Utility.Enums import *
-from PLEXOSCommon.Enums import *
-from System import DateTime
-from System import *
+try:
+    import clr
+    sys.path.append(plexos_path)
+    clr.AddReference('PLEXOS_NET.Core')
+    clr.AddReference('EEUTILITY')
+    clr.AddReference('EnergyExemplar.PLEXOS.Utility')
+    clr.AddReference('PLEXOSCommon')
+
+    # Import from .NET assemblies (both PLEXOS and system)
+    from PLEXOS_NET.Core import *
+    from EEUTILITY.Enums import *
+    from EnergyExemplar.PLEXOS.Utility.Enums import *
+    from PLEXOSCommon.Enums import *
+    from System import DateTime
+    from System import *
+    HAS_PLEXOS_NET = True
+except Exception:
+    HAS_PLEXOS_NET = False
+
+# Extraction backends: 'net' queries through PLEXOS_NET.Core.Solution, 'zip' decodes the solution zip directly
+BACKENDS = ['net', 'zip']
+DEFAULT_BACKEND = 'net' if HAS_PLEXOS_NET else 'zip'
+
+# Modes of a mappings.json entry: 'write' creates its output file, 'append' adds its rows to the end of the
+# output file of an earlier entry with the same output name
+OUTPUT_MODES = ['write', 'append']
+
+# Estimated peak memory in bytes per row while a chunk of rows is converted and written, by output format.
+# Measured with tracemalloc on write_rows and on results_to_frame followed by the Arrow conversion.
+CHUNK_ROW_BYTES = {'csv': 300, 'parquet': 100, 'feather': 100}
+
+# Length in hours of the first .NET Interval query window when streaming. Later windows are sized from the
+# number of rows per hour returned so far.
+STREAM_FIRST_WINDOW_HOURS = 24 * 31
+
+# Folder of the output folder holding the completion markers and manifests of sharded runs
+SHARD_FOLDER = '.shards'
+
+# Output file formats, also used as file extensions
+OUTPUT_FORMATS = ['csv', 'parquet', 'feather']
 
 def parse_collection_enum(collection_enum_str):
     """
@@ -45,9 +81,14 @@ def parse_collection_enum(collection_enum_str):
             collection_mapping[int(cid)] = name
     return collection_mapping
 
+# Horizon of each solution zip, keyed by (absolute zip path, mtime), so Solution.xml is scanned once per solution file per run
+HORIZON_CACHE = {}
+
 def find_horizon(sol_file, print_enabled=False):
     """
     Function to find a model's horizon of dates in the XML file within a specified zip file.
+    The period table is scanned with a streaming parser that stops as soon as the table ends, and
+    the result is cached per solution file (path + mtime).
 
     Args:
     - sol_file: Path to the solution zip file.
@@ -57,86 +98,797 @@ def find_horizon(sol_file, print_enabled=False):
     - date_from: Start date found in the XML file.
     - date_to: End date found in the XML file.
     """
-    with zipfile.ZipFile(sol_file) as zf:
-        list_of_files_in_zip = zf.namelist()
-        xml_file = None  
+    cache_key = (os.path.abspath(sol_file), os.path.getmtime(sol_file))
+    if cache_key in HORIZON_CACHE:
+        return HORIZON_CACHE[cache_key]
 
-        for name in list_of_files_in_zip:
-            if name.endswith("Solution.xml"):
-                xml_file = name
-                break 
+    with zipfile.ZipFile(sol_file) as zf:
+        xml_file = find_solution_xml(zf)
         if not xml_file:
             print(f"No XML file found in {sol_file}")
             return None, None
 
+        date_from = datetime.max
+        date_to = datetime.min
         try:
             with zf.open(xml_file) as xml_fp:
-                tree = ET.parse(xml_fp)
-                root = tree.getroot()
-                namespace = {'ns': 'http://tempuri.org/SolutionDataset.xsd'}
-                date_from = datetime.max
-                date_to = datetime.min
-                line_count = 0
-                for t_period in root.findall('.//ns:t_period_0', namespace):
-                    datetime_str = t_period.find('ns:datetime', namespace).text
-
-                    if print_enabled:
-                        print("Datetime string:", datetime_str) 
-
-                    try:
-                        datetime_obj = datetime.strptime(datetime_str, '%d/%m/%Y %H:%M:%S')
-                    except Exception as e:
-                        print("Error parsing datetime string:", e)
-                        continue
-
-                    if datetime_obj < date_from:
-                        date_from = datetime_obj
-                    if datetime_obj > date_to:
-                        date_to = datetime_obj
-                    line_count += 1
+                datetime_strs = scan_period_datetimes(xml_fp)
+            if print_enabled:
+                for datetime_str in datetime_strs:
+                    print("Datetime string:", datetime_str)
+            datetimes = parse_datetimes(datetime_strs)
+            if np.isnat(datetimes).any():
+                print(f"Error parsing {int(np.isnat(datetimes).sum())} datetime string(s) in {sol_file}")
+                datetimes = datetimes[~np.isnat(datetimes)]
+            if len(datetimes):
+                date_from = datetimes.min().astype(datetime)
+                date_to = datetimes.max().astype(datetime)
+                HORIZON_CACHE[cache_key] = (date_from, date_to)
         except Exception as e:
-            print(f"Error while processing the XML: {e}")
-            input('Press any key to continue...')
+            raise ValueError(f"Error while processing the XML of {sol_file}: {e}") from e
 
     return date_from, date_to
 
-def append_files(output_folder):
+# Common columns for all output files
+COLUMNS = ["category_name", "p1", "year", "month", "day", "hour", "value"]
+
+def add_timing(timings, phase, start):
+    """
+    Add the time elapsed since start (from time.perf_counter) to a phase of the timings dict.
+    """
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+def report_timings(timings):
+    """
+    Print the total time spent in each extraction phase.
+
+    Args:
+    - timings: Dict mapping phase name to seconds.
+    """
+    total = sum(timings.values())
+    print("Extraction timing by phase:")
+    for phase, seconds in timings.items():
+        share = 100 * seconds / total if total else 0
+        print(f"  {phase:<10} {seconds:10.2f} s  ({share:5.1f}%)")
+    print(f"  {'total':<10} {total:10.2f} s")
+
+def net_timestamp(date):
+    """
+    Format a datetime as the 'M/d/yyyy h:mm:ss tt' string parsed by System.DateTime.Parse.
+    """
+    return date.strftime('%m/%d/%Y %I:%M:%S %p').replace('/0', '/').lstrip("0").replace(" 0", " ")
+
+def query_net(sol, collection_id, property_id, period_enum_value, date_from, date_to):
+    """
+    Run QueryToList on an open PLEXOS_NET Solution for one collection/property between two dates.
+
+    Args:
+    - sol: Connected PLEXOS_NET.Core.Solution.
+    - collection_id: The collection ID.
+    - property_id: The property ID.
+    - period_enum_value: 'FiscalYear' or 'Interval'
+    - date_from: Start datetime.
+    - date_to: End datetime.
+
+    Returns:
+    - result: List of rows returned by QueryToList.
+    """
+    import System
+
+    start = getattr(getattr(System, "DateTime"), "Parse")(net_timestamp(date_from))
+    end = getattr(getattr(System, "DateTime"), "Parse")(net_timestamp(date_to))
+    return sol.QueryToList(
+        SimulationPhaseEnum.LTPlan,                  # simulation
+        collection_id,                               # collectionEnum
+        "",                                          # parentName
+        "",                                          # childName
+        getattr(PeriodEnum, f'{period_enum_value}'), # periodEnum
+        SeriesTypeEnum.Properties,                   # seriesEnum
+        str(property_id),                            # propertyList
+        start,
+        end,
+        "",                                          # timeSliceList
+        "",                                          # sampleList
+        "",                                          # modelName
+        AggregationTypeEnum.CategoryAggregation,     # aggregation
+        "",                                          # category
+        ",",                                         # seperator
+        OperationTypeEnum.SUM                        # operation
+    )
+
+def write_rows(csvfile, categories, dates, values):
+    """
+    Write equally long category, date and value columns as one block of rows of the common output columns.
+
+    Timestamps and categories repeat across rows, so each unique one is formatted once and the rows are
+    joined into a single string in the CSV format of csv.writer. Each category is quoted by csv.writer on
+    its own, so names holding commas, quotes or line breaks stay one field.
+
+    Args:
+    - csvfile: Output file, opened with newline=''.
+    - categories: Array of category names.
+    - dates: datetime64 array.
+    - values: float64 array.
+
+    Returns:
+    - rows: Number of rows written.
+    """
+    if not len(values):
+        return 0
+    category_codes, unique_categories = pd.factorize(np.asarray(categories, dtype=object))
+    date_codes, unique_dates = pd.factorize(np.asarray(dates, dtype='datetime64[s]'))
+
+    buffer = io.StringIO()
+    csvwriter = csv.writer(buffer)
+    category_strs = np.empty(len(unique_categories), dtype=object)
+    for i, category in enumerate(unique_categories):
+        buffer.seek(0)
+        buffer.truncate()
+        # A second field so that an empty category is written empty, as within a row, and not as '""'
+        csvwriter.writerow([category, ''])
+        category_strs[i] = buffer.getvalue()[:-len(csvwriter.dialect.lineterminator) - 1]
+    years, months, days, hours = split_datetimes(unique_dates)
+    date_strs = np.array([f"p1,{y},{m},{d},{h}" for y, m, d, h in zip(years.tolist(), months.tolist(), days.tolist(), hours.tolist())],
+                         dtype=object)
+
+    prefixes = category_strs[category_codes] + ',' + date_strs[date_codes] + ','
+    # repr matches how csv.writer formats floats
+    csvfile.write(''.join([prefix + repr(value) + '\r\n' for prefix, value in zip(prefixes.tolist(), values.tolist())]))
+    return len(values)
+
+def parse_net_datetimes(date_strs):
+    """
+    Vectorized parse of .NET 'M/d/yyyy h:mm:ss tt' date strings into a datetime64[s] array.
+
+    Every timestamp is repeated once per category, so only the unique strings are parsed.
+
+    Args:
+    - date_strs: Sequence of date strings.
+
+    Returns:
+    - datetime64[s] NumPy array (NaT where a string could not be parsed).
+    """
+    inverse, unique_strs = pd.factorize(np.asarray(date_strs, dtype=object))
+    parsed = pd.to_datetime(pd.Series(unique_strs, dtype=object), format='%m/%d/%Y %I:%M:%S %p', errors='coerce')
+    missing = parsed.isna().values
+    if missing.any():
+        # Dates at midnight may be printed without a time component
+        parsed[missing] = pd.to_datetime(pd.Series(unique_strs[missing], dtype=object), format='%m/%d/%Y', errors='coerce')
+    return parsed.values.astype('datetime64[s]')[inverse]
+
+def net_result_columns(result):
+    """
+    Pull the category, date and value columns out of the rows returned by QueryToList.
+
+    Each column is pulled out of the result list in one pass and the dates are parsed in a single vectorized pass.
+    Rows with unparseable dates are dropped.
+
+    Args:
+    - result: List of rows returned by QueryToList.
+
+    Returns:
+    - categories: Array of category names.
+    - dates: datetime64[s] array.
+    - values: float64 array.
+    """
+    categories = np.array([row.category_name for row in result], dtype=object)
+    values = np.fromiter((row.value for row in result), dtype=np.float64, count=len(result))
+    dates = parse_net_datetimes([str(row._date) for row in result])
+
+    valid = ~np.isnat(dates)
+    if not valid.all():
+        print(f"Error processing {np.count_nonzero(~valid)} rows: unparseable dates")
+        categories, values, dates = categories[valid], values[valid], dates[valid]
+    return categories, dates, values
+
+def write_net_rows(csvfile, result):
+    """
+    Write the rows returned by QueryToList as one block of rows of the common output columns.
+
+    Args:
+    - csvfile: Output file, opened with newline=''.
+    - result: List of rows returned by QueryToList.
+
+    Returns:
+    - rows: Number of rows written.
+    """
+    return write_rows(csvfile, *net_result_columns(result))
+
+def results_to_frame(categories, dates, values):
     """
-    Function to append '_append' files to their corresponding CSV files.
-    
+    Build a DataFrame of the common output columns with compact types: categorical category_name and p1,
+    int16 year/month/day/hour and float64 value.
+
     Args:
+    - categories: Array of category names.
+    - dates: datetime64 array.
+    - values: float64 array.
+
+    Returns:
+    - df: DataFrame with the COLUMNS columns.
+    """
+    years, months, days, hours = split_datetimes(dates)
+    return pd.DataFrame({
+        'category_name': pd.Categorical(np.asarray(categories, dtype=object)),
+        'p1': pd.Categorical.from_codes(np.zeros(len(years), dtype=np.int8), ['p1']),
+        'year': years.astype(np.int16),
+        'month': months.astype(np.int16),
+        'day': days.astype(np.int16),
+        'hour': hours.astype(np.int16),
+        'value': np.asarray(values, dtype=np.float64),
+    }, columns=COLUMNS)
+
+def year_windows(date_from, date_to):
+    """
+    Partition a horizon into yearly (start, end) windows, the last one ending at date_to.
+    """
+    windows = []
+    current_date = date_from
+    while current_date <= date_to:
+        end_of_year = (current_date + relativedelta(years=1)) - timedelta(hours=1)
+        windows.append((current_date, min(end_of_year, date_to)))
+        current_date += relativedelta(years=1)
+    return windows
+
+def peak_memory():
+    """
+    Return the peak resident memory of the current process in bytes, or None if it cannot be measured.
+    Uses the resource module on Linux and macOS, and psutil (if installed) on Windows.
+    """
+    try:
+        import resource
+        # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    except ImportError:
+        return None
+
+def chunk_rows_for(memory_limit, output_format):
+    """
+    Number of rows per chunk that keeps the conversion of one chunk within memory_limit megabytes.
+    """
+    return max(1, int(memory_limit * 1024 * 1024 // CHUNK_ROW_BYTES[output_format]))
+
+def chunk_blocks(blocks, chunk_rows):
+    """
+    Split (categories, dates, values) blocks into consecutive blocks of at most chunk_rows rows.
+    """
+    for categories, dates, values in blocks:
+        for start in range(0, len(values), chunk_rows):
+            end = start + chunk_rows
+            yield categories[start:end], dates[start:end], values[start:end]
+
+def stream_schema(output_file):
+    """
+    Arrow schema of the common output columns written by stream_blocks. category_name and p1 are dictionary
+    (categorical) columns in Parquet files and plain strings in Feather files (see open_table_writer).
+    """
+    import pyarrow as pa
+
+    text = pa.string() if output_file.endswith('.feather') else pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([('category_name', text), ('p1', text), ('year', pa.int16()), ('month', pa.int16()),
+                      ('day', pa.int16()), ('hour', pa.int16()), ('value', pa.float64())])
+
+def stream_blocks(blocks, output_file, chunk_rows, append=False, timings=None):
+    """
+    Write blocks of rows to output_file in chunks of at most chunk_rows rows. Each chunk is converted and flushed
+    to the file before the next one is pulled from blocks, so memory does not grow with the size of the output.
+
+    Appended Parquet and Feather rows are streamed to a temporary file first, which is then appended to
+    output_file in batches of at most chunk_rows rows (see append_output).
+
+    Args:
+    - blocks: Iterable of (categories, dates, values) arrays, e.g. from query_property.
+    - output_file: Path of the file to write. Its extension selects the output format.
+    - chunk_rows: Maximum number of rows converted at a time.
+    - append: Append to output_file instead of overwriting it.
+    - timings: Optional dict of seconds per phase, updated in place.
+
+    Returns:
+    - rows: Number of rows written.
+    """
+    append = append and os.path.exists(output_file)
+    rows = 0
+    if output_file.endswith('.csv'):
+        if append:
+            check_csv_header(output_file, COLUMNS)
+        with open(output_file, 'a' if append else 'w', newline='') as csvfile:
+            if not append:
+                csv.writer(csvfile).writerow(COLUMNS)
+            for categories, dates, values in chunk_blocks(blocks, chunk_rows):
+                start = time.perf_counter()
+                rows += write_rows(csvfile, categories, dates, values)
+                csvfile.flush()
+                add_timing(timings, 'write', start)
+        return rows
+
+    import pyarrow as pa
+
+    base, ext = os.path.splitext(output_file)
+    stream_file = f"{base}.stream{ext}" if append else output_file
+    schema = stream_schema(output_file)
+    writer = open_table_writer(stream_file, schema)
+    try:
+        try:
+            for categories, dates, values in chunk_blocks(blocks, chunk_rows):
+                start = time.perf_counter()
+                df = results_to_frame(categories, dates, values)
+                if output_file.endswith('.feather'):
+                    df = df.astype({'category_name': object, 'p1': object})
+                writer.write_table(pa.Table.from_pandas(df, preserve_index=False).cast(schema))
+                rows += len(df)
+                add_timing(timings, 'write', start)
+        finally:
+            writer.close()
+        if append:
+            start = time.perf_counter()
+            append_output(stream_file, output_file, chunk_rows)
+            add_timing(timings, 'write', start)
+    finally:
+        if append and os.path.exists(stream_file):
+            os.remove(stream_file)
+    return rows
+
+def write_block(output_file, categories, dates, values):
+    """
+    Write one block of rows to a new output file, in the format given by its extension.
+
+    Returns:
+    - rows: Number of rows written.
+    """
+    if output_file.endswith('.csv'):
+        with open(output_file, 'w', newline='') as csvfile:
+            csv.writer(csvfile).writerow(COLUMNS)
+            return write_rows(csvfile, categories, dates, values)
+    write_output(results_to_frame(categories, dates, values), output_file)
+    return len(values)
+
+def extract_years_concurrently(sol_file_path, collection_id, property_id, output_file, year_workers, timings=None, append=False):
+    """
+    Query an Interval collection/property with one .NET query per year, running up to year_workers queries at a
+    time on separate solution connections. Each year is written to its own shard file next to output_file, and
+    the shards are merged in order into output_file at the end.
+
+    Args:
+    - sol_file_path: Path to the solution zip file.
+    - collection_id: The collection ID.
+    - property_id: The property ID.
+    - output_file: Path of the file to write. Its extension selects the output format.
+    - year_workers: Number of concurrent yearly queries.
+    - timings: Optional dict of seconds per phase, updated in place.
+    - append: Append to output_file instead of overwriting it.
+
+    Returns:
+    - rows: Number of rows written.
+    """
+    start = time.perf_counter()
+    date_from, date_to = find_horizon(sol_file_path)
+    add_timing(timings, 'horizon', start)
+    windows = year_windows(date_from, date_to)
+    print(f"Interval query detected. Querying horizon {date_from} - {date_to} as {len(windows)} years with {year_workers} threads...")
+
+    base, ext = os.path.splitext(output_file)
+    shard_files = [f"{base}.part{i:03d}{ext}" for i in range(len(windows))]
+
+    def extract_year(shard_file, window_from, window_to):
+        sol = Solution()
+        try:
+            sol.Connection(sol_file_path)
+            result = query_net(sol, collection_id, property_id, "Interval", window_from, window_to)
+            return write_block(shard_file, *net_result_columns(result))
+        finally:
+            sol.Close()
+
+    try:
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=year_workers) as executor:
+            futures = [executor.submit(extract_year, shard_file, window_from, window_to)
+                       for shard_file, (window_from, window_to) in zip(shard_files, windows)]
+            rows = sum(future.result() for future in futures)
+        add_timing(timings, 'query', start)
+        start = time.perf_counter()
+        if shard_files:
+            concat_outputs(shard_files, output_file, append)
+        elif not (append and os.path.exists(output_file)):
+            write_block(output_file, [], np.array([], dtype='datetime64[s]'), np.array([]))
+        add_timing(timings, 'write', start)
+    finally:
+        for shard_file in shard_files:
+            if os.path.exists(shard_file):
+                os.remove(shard_file)
+    return rows
+
+def query_net_stream(sol, collection_id, property_id, date_from, date_to, chunk_rows, timings=None):
+    """
+    Query an Interval collection/property through the .NET API in windows sized to return about chunk_rows rows
+    each, and yield the rows of each window in blocks of at most chunk_rows rows.
+
+    QueryToList materializes the whole result list of a window, so the first window is STREAM_FIRST_WINDOW_HOURS
+    long and each following window is sized from the rows per hour returned so far.
+
+    Yields:
+    - (categories, dates, values) arrays.
+    """
+    window_hours = STREAM_FIRST_WINDOW_HOURS
+    window_from = date_from
+    while window_from <= date_to:
+        window_to = min(window_from + timedelta(hours=window_hours - 1), date_to)
+        start = time.perf_counter()
+        result = query_net(sol, collection_id, property_id, "Interval", window_from, window_to)
+        add_timing(timings, 'query', start)
+        result_rows = len(result)
+        for offset in range(0, result_rows, chunk_rows):
+            start = time.perf_counter()
+            block = net_result_columns(result.GetRange(offset, min(chunk_rows, result_rows - offset)))
+            add_timing(timings, 'convert', start)
+            yield block
+        del result
+        span_hours = (window_to - window_from) / timedelta(hours=1) + 1
+        window_hours = max(1, int(span_hours * chunk_rows / result_rows)) if result_rows else window_hours * 2
+        window_from = window_to + timedelta(hours=1)
+
+def query_property(sol, backend, sol_file_path, collection_id, property_id, period_enum_value, timings=None, chunk_rows=None):
+    """
+    Query one collection/property from an open solution.
+
+    Args:
+    - sol: Connected solution (PLEXOS_NET Solution or ZipSolution, depending on backend).
+    - backend: 'net' or 'zip'.
+    - sol_file_path: Path to the solution zip file.
+    - collection_id: The collection ID.
+    - property_id: The property ID.
+    - period_enum_value: 'FiscalYear' or 'Interval'
+    - timings: Optional dict of seconds per phase, updated in place.
+    - chunk_rows: Stream queries in blocks of about chunk_rows rows. Zip queries are read in windows of timestamps
+      (see ZipSolution.query_blocks) and Interval .NET queries in windows of hours (see query_net_stream). Other
+      .NET queries, whose results have one row per category and period, are run at once and converted in blocks.
+
+    Yields:
+    - (categories, dates, values) arrays, one block per query (Interval .NET queries are partitioned by year).
+    """
+    if backend == 'zip':
+        start = time.perf_counter()
+        for result in sol.query_blocks(collection_id, property_id, period_enum_value, 'LTPlan', chunk_rows=chunk_rows):
+            add_timing(timings, 'query', start)
+            yield result['category_name'], result['datetime'], result['value']
+            start = time.perf_counter()
+        return
+
+    start = time.perf_counter()
+    date_from, date_to = find_horizon(sol_file_path)
+    add_timing(timings, 'horizon', start)
+
+    if period_enum_value == "Interval" and chunk_rows:
+        print(f"Interval query detected. Streaming horizon {date_from} - {date_to} in windows of about {chunk_rows} rows...")
+        yield from query_net_stream(sol, collection_id, property_id, date_from, date_to, chunk_rows, timings)
+        return
+    if period_enum_value == "Interval":
+        # Partition data by year
+        print(f"Interval query detected. Partitioning horizon {date_from} - {date_to} by year...")
+        windows = year_windows(date_from, date_to)
+    else:
+        windows = [(date_from, date_to)]
+
+    for window_from, window_to in windows:
+        start = time.perf_counter()
+        result = query_net(sol, collection_id, property_id, period_enum_value, window_from, window_to)
+        add_timing(timings, 'query', start)
+        if chunk_rows:
+            result_rows = len(result)
+            for offset in range(0, result_rows, chunk_rows):
+                start = time.perf_counter()
+                block = net_result_columns(result.GetRange(offset, min(chunk_rows, result_rows - offset)))
+                add_timing(timings, 'convert', start)
+                yield block
+            continue
+        start = time.perf_counter()
+        block = net_result_columns(result)
+        add_timing(timings, 'convert', start)
+        yield block
+
+def extract_property(sol, backend, sol_file_path, collection_id, property_id, period_enum_value, output_file, timings=None, append=False,
+                     year_workers=1, chunk_rows=None):
+    """
+    Query one collection/property from an open solution and write it to output_file.
+
+    CSV files are written block by block as the queries return. Parquet and Feather files are written once with
+    the typed columns of results_to_frame. With append, the rows are appended to output_file if it exists.
+    With year_workers > 1, Interval queries of the .NET backend run concurrently (see extract_years_concurrently).
+    With chunk_rows, rows of every format are written in chunks of at most chunk_rows rows (see stream_blocks).
+
+    Args:
+    - sol: Connected solution (PLEXOS_NET Solution or ZipSolution, depending on backend).
+    - backend: 'net' or 'zip'.
+    - sol_file_path: Path to the solution zip file.
+    - collection_id: The collection ID.
+    - property_id: The property ID.
+    - period_enum_value: 'FiscalYear' or 'Interval'
+    - output_file: Path of the file to write. Its extension selects the output format.
+    - timings: Optional dict of seconds per phase, updated in place.
+    - append: Append to output_file instead of overwriting it.
+    - year_workers: Number of concurrent yearly Interval queries of the .NET backend.
+    - chunk_rows: Optional maximum number of rows converted and written at a time.
+
+    Returns:
+    - rows: Number of rows written.
+    """
+    if chunk_rows:
+        blocks = query_property(sol, backend, sol_file_path, collection_id, property_id, period_enum_value, timings, chunk_rows)
+        return stream_blocks(blocks, output_file, chunk_rows, append, timings)
+    if year_workers > 1 and backend == 'net' and period_enum_value == "Interval":
+        return extract_years_concurrently(sol_file_path, collection_id, property_id, output_file, year_workers, timings, append)
+
+    append = append and os.path.exists(output_file)
+    blocks = query_property(sol, backend, sol_file_path, collection_id, property_id, period_enum_value, timings)
+    if output_file.endswith('.csv'):
+        rows = 0
+        if append:
+            check_csv_header(output_file, COLUMNS)
+        with open(output_file, 'a' if append else 'w', newline='') as csvfile:
+            if not append:
+                csv.writer(csvfile).writerow(COLUMNS)
+            for categories, dates, values in blocks:
+                start = time.perf_counter()
+                rows += write_rows(csvfile, categories, dates, values)
+                add_timing(timings, 'write', start)
+        return rows
+
+    blocks = list(blocks)
+    start = time.perf_counter()
+    if blocks:
+        columns = [np.concatenate(column) for column in zip(*blocks)]
+    else:
+        columns = [[], np.array([], dtype='datetime64[s]'), []]
+    df = results_to_frame(*columns)
+    if append:
+        append_frame(df, output_file)
+    else:
+        write_output(df, output_file)
+    add_timing(timings, 'write', start)
+    return len(df)
+
+def process_solution(sol_file, work_items, input_folder, output_folder, period_enum_value, backend=DEFAULT_BACKEND, timings=None, interactive=True,
+                     output_format='csv', manifest=None, year_workers=1, shard=None, memory_limit=None):
+    """
+    Open one solution file once and extract every collection/property of work_items from that connection.
+    With a shard, only the outputs of work_items that belong to the shard are extracted (see in_shard).
+
+    With a manifest, output files that are up to date with the solution zip and the extraction settings are
+    skipped, and the solution is not opened at all if every output is up to date.
+
+    Args:
+    - sol_file: Solution zip file name.
+    - work_items: List of (collection_id, collection_name, property_id, output_name, append) tuples from build_work_items.
+    - input_folder: Path to the input folder.
     - output_folder: Path to the output folder.
+    - period_enum_value: 'FiscalYear' or 'Interval'
+    - backend: 'net' to query through the PLEXOS .NET API, 'zip' to read the solution zips directly.
+    - timings: Optional dict of seconds per phase, updated in place.
+    - interactive: Wait for the user after logging an error. Pool workers pass False.
+    - output_format: One of OUTPUT_FORMATS.
+    - manifest: Optional manifest from load_manifest, not modified.
+    - year_workers: Number of concurrent yearly Interval queries of the .NET backend.
+    - shard: Optional (index, count) tuple from parse_shard.
+    - memory_limit: Optional memory ceiling in megabytes of each chunk of rows converted and written.
+      Outputs are then streamed in chunks (see stream_blocks).
+
+    Returns:
+    - summary: Dict with the solution file name, number of queries and rows written, number of output files
+      skipped, the logged errors, the names of the outputs completed (extracted or up to date), the peak
+      memory of the process in bytes and the manifest updates to apply with update_manifest.
     """
-    # Traverse the output folder
-    for root, dirs, files in os.walk(output_folder):
-        for file in files:
-            # Check for '_append' in the file name
-            if '_append' in file:
-                append_file_path = os.path.join(root, file)
-                original_file_path = append_file_path.replace('_append', '')
+    if backend == 'net' and not HAS_PLEXOS_NET:
+        raise RuntimeError("The 'net' backend requires pythonnet and the PLEXOS API. Use the 'zip' backend instead.")
 
-                # Check if the original file exists
-                if os.path.exists(original_file_path):
-                    try:
-                        # Read the content of the _append file and the original file
-                        append_df = pd.read_csv(append_file_path)
-                        original_df = pd.read_csv(original_file_path)
+    sol_file_path = os.path.join(input_folder, sol_file)
+    solution_name = os.path.splitext(os.path.basename(sol_file))[0]
+    summary = {'sol_file': sol_file, 'queries': 0, 'rows': 0, 'skipped': 0, 'errors': [], 'completed': [],
+               'peak_memory': None, 'manifest': empty_manifest()}
+    chunk_rows = chunk_rows_for(memory_limit, output_format) if memory_limit else None
+    if shard is not None:
+        work_items = [item for item in work_items if in_shard(solution_name, item[3], shard)]
+        if not work_items:
+            return summary
+    solution_output_folder = os.path.join(output_folder, period_enum_value, solution_name, "outputs")
+    os.makedirs(solution_output_folder, exist_ok=True)
+    output_files = {output_name: os.path.join(solution_output_folder, f"{output_name}.{output_format}")
+                    for collection_id, collection_name, property_id, output_name, append in work_items}
+    if manifest is not None:
+        start = time.perf_counter()
+        fingerprint = solution_fingerprint(sol_file_path, manifest)
+        summary['manifest']['solutions'][solution_key(sol_file_path)] = fingerprint
+        add_timing(timings, 'fingerprint', start)
+        settings = {output_name: {'entries': [[item[0], item[2], item[4]] for item in work_items if item[3] == output_name],
+                                  'period': period_enum_value, 'backend': backend, 'format': output_format}
+                    for output_name in output_files}
+        up_to_date = {output_name for output_name, output_file in output_files.items()
+                      if is_up_to_date(manifest, output_folder, output_file, fingerprint['sha256'], settings[output_name])}
+        summary['skipped'] = len(up_to_date)
+        summary['completed'] = sorted(up_to_date)
+        work_items = [item for item in work_items if item[3] not in up_to_date]
+        if not work_items:
+            print(f"All outputs of {sol_file} are up to date, skipping")
+            return summary
+        if up_to_date:
+            print(f"Skipping up to date outputs of {sol_file}: {', '.join(sorted(up_to_date))}")
+    print(f"Processing {sol_file} ({len(work_items)} collection/property queries)...")
 
-                        # Append the data
-                        combined_df = pd.concat([original_df, append_df])
+    output_rows = {}
+    failed = set()
+    sol = ZipSolution() if backend == 'zip' else Solution()
+    start = time.perf_counter()
+    try:
+        sol.Connection(sol_file_path)
+        add_timing(timings, 'connect', start)
+        for collection_id, collection_name, property_id, output_name, append in work_items:
+            output_file = output_files[output_name]
+            print(f'Processing {collection_name} (ID: {collection_id}) property {property_id} for {sol_file}...')
+            try:
+                rows = extract_property(sol, backend, sol_file_path, collection_id, property_id, period_enum_value, output_file, timings, append,
+                                        year_workers, chunk_rows)
+                summary['rows'] += rows
+                summary['queries'] += 1
+                output_rows[output_name] = output_rows.get(output_name, 0) + rows
+                print(f'Results saved to {output_file}')
+            except Exception as e:
+                failed.add(output_name)
+                summary['errors'].append(log_error(f"Error processing {collection_name} for {sol_file_path}: {e}", interactive))
+    except Exception as e:
+        failed.update(item[3] for item in work_items)
+        summary['errors'].append(log_error(f"Error opening {sol_file_path}: {e}", interactive))
+    finally:
+        start = time.perf_counter()
+        sol.Close()
+        add_timing(timings, 'close', start)
 
-                        # Save back to the original file
-                        combined_df.to_csv(original_file_path, index=False)
-                        print(f"Appended {file} to {os.path.basename(original_file_path)}")
+    summary['completed'] += sorted({item[3] for item in work_items} - failed)
+    summary['peak_memory'] = peak_memory()
+    if manifest is not None:
+        # Outputs with a failed query are dropped from the manifest so the next run extracts them again
+        for output_name in {item[3] for item in work_items}:
+            output_file = output_files[output_name]
+            record = None
+            if output_name not in failed and os.path.isfile(output_file):
+                record = output_record(output_file, sol_file_path, fingerprint['sha256'], settings[output_name], output_rows.get(output_name, 0))
+            summary['manifest']['outputs'][output_key(output_folder, output_file)] = record
+    return summary
 
-                    except Exception as e:
-                        print(f"Error appending {file} to {os.path.basename(original_file_path)}: {e}")
-                else:
-                    print(f"Original file not found for {file}, skipping append.")
+def log_error(error_message, interactive=True, exception=None):
+    """
+    Print an error and append it with the current traceback, or the traceback of exception, to error_log.txt.
 
-def process_collection_chunk(collection_id, collection_name, input_folder, output_folder, sol_files, property_id, period_enum_value):
+    Args:
+    - error_message: Message to log.
+    - interactive: Wait for the user to acknowledge the error.
+    - exception: Optional exception whose traceback is logged instead of the current one.
+
+    Returns:
+    - error_message: The logged message.
+    """
+    print(error_message)
+    # A single write per error, so messages appended by concurrent workers do not interleave
+    with open("error_log.txt", "a") as f:
+        if exception is not None:
+            error_traceback = ''.join(traceback.format_exception(type(exception), exception, exception.__traceback__))
+        else:
+            error_traceback = traceback.format_exc()
+        f.write(error_message + "\n" + error_traceback + "\n")
+    if interactive:
+        input('Press any key to continue...')
+    return error_message
+
+def solution_worker(sol_file, work_items, input_folder, output_folder, period_enum_value, backend, output_format='csv', manifest=None,
+                    year_workers=1, shard=None, memory_limit=None):
+    """
+    Process one solution in a pool worker process, without waiting for the user on errors.
+
+    Returns:
+    - summary: process_solution summary, with the worker's phase timings and elapsed seconds added.
+    """
+    timings = {}
+    start = time.perf_counter()
+    summary = process_solution(sol_file, work_items, input_folder, output_folder, period_enum_value, backend, timings, interactive=False,
+                               output_format=output_format, manifest=manifest, year_workers=year_workers, shard=shard,
+                               memory_limit=memory_limit)
+    summary['timings'] = timings
+    summary['elapsed'] = time.perf_counter() - start
+    return summary
+
+def process_solutions_parallel(sol_files, work_items, input_folder, output_folder, period_enum_value, workers, backend=DEFAULT_BACKEND, timings=None,
+                               output_format='csv', manifest=None, on_summary=None, year_workers=1, shard=None, memory_limit=None):
+    """
+    Process solution files in a pool of worker processes, each opening its own solution connection.
+
+    At most two solutions per worker are queued at a time. Errors are written to error_log.txt by the workers
+    and listed at the end instead of waiting for the user.
+
+    Args:
+    - sol_files: List of solution files.
+    - work_items: List of (collection_id, collection_name, property_id, output_name, append) tuples from build_work_items.
+    - input_folder: Path to the input folder.
+    - output_folder: Path to the output folder.
+    - period_enum_value: 'FiscalYear' or 'Interval'
+    - workers: Number of worker processes.
+    - backend: 'net' or 'zip'.
+    - timings: Optional dict of seconds per phase, summed over all workers and updated in place.
+    - output_format: One of OUTPUT_FORMATS.
+    - manifest: Optional manifest from load_manifest, passed to every worker.
+    - on_summary: Optional function called with each summary as soon as its solution is done.
+    - year_workers: Number of concurrent yearly Interval queries of the .NET backend in each worker.
+    - shard: Optional (index, count) tuple from parse_shard.
+    - memory_limit: Optional memory ceiling in megabytes of each chunk of rows in each worker.
+
+    Returns:
+    - summaries: List of process_solution summaries, in completion order.
+    """
+    summaries = []
+    pending = set()
+    # Solution file of each submitted future, to report the solutions of failed workers
+    future_files = {}
+    remaining = list(sol_files)
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        while remaining or pending:
+            # Bounded queue: keep at most 2 * workers solutions submitted
+            while remaining and len(pending) < 2 * workers:
+                sol_file = remaining.pop(0)
+                future = executor.submit(solution_worker, sol_file, work_items, input_folder, output_folder, period_enum_value, backend,
+                                         output_format, manifest, year_workers, shard, memory_limit)
+                future_files[future] = sol_file
+                pending.add(future)
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                sol_file = future_files.pop(future)
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    error = log_error(f"Worker failed processing {sol_file}: {e}", interactive=False, exception=e)
+                    summary = {'sol_file': sol_file, 'queries': 0, 'rows': 0, 'skipped': 0, 'completed': [], 'peak_memory': None, 'timings': {}, 'elapsed': 0.0,
+                               'errors': [error], 'manifest': empty_manifest()}
+                summaries.append(summary)
+                if on_summary is not None:
+                    on_summary(summary)
+                for phase, seconds in summary['timings'].items():
+                    if timings is not None:
+                        timings[phase] = timings.get(phase, 0.0) + seconds
+                elapsed = time.perf_counter() - start
+                print(f"[{len(summaries)}/{len(sol_files)}] {summary['sol_file']}: {summary['rows']} rows in "
+                      f"{summary['elapsed']:.1f} s, {len(summary['errors'])} errors ({elapsed:.1f} s elapsed)")
+    return summaries
+
+def report_throughput(summaries, elapsed):
+    """
+    Print the number of solutions, queries and rows processed, the throughput and the errors of a run.
+
+    Args:
+    - summaries: List of process_solution summaries.
+    - elapsed: Wall-clock seconds of the run.
+    """
+    rows = sum(s['rows'] for s in summaries)
+    queries = sum(s['queries'] for s in summaries)
+    skipped = sum(s['skipped'] for s in summaries)
+    errors = [e for s in summaries for e in s['errors']]
+    rate = rows / elapsed if elapsed else 0
+    print(f"Processed {len(summaries)} solutions, {queries} queries, {rows} rows in {elapsed:.1f} s "
+          f"({len(summaries) / elapsed if elapsed else 0:.2f} solutions/s, {rate:.0f} rows/s)")
+    if skipped:
+        print(f"Skipped {skipped} up to date output files")
+    peaks = [s['peak_memory'] for s in summaries if s.get('peak_memory')]
+    if peaks:
+        print(f"Peak memory of the extraction processes: {max(peaks) / 1024 ** 2:.0f} MB")
+    if errors:
+        print(f"{len(errors)} errors, see error_log.txt:")
+        for error in errors:
+            print(f"  {error}")
+
+def process_collection_chunk(collection_id, collection_name, input_folder, output_folder, sol_files, property_id, period_enum_value, backend=DEFAULT_BACKEND):
     """
-    Function to process a collection of data.
+    Function to process a single collection/property across solution files.
 
     Args:
     - collection_id: The collection ID.
@@ -146,220 +898,314 @@ def process_collection_chunk(collection_id, collection_name, input_folder, outpu
     - sol_files: List of solution files.
     - property_id: The property ID to process.
     - period_enum_value: 'FiscalYear' or 'Interval'
+    - backend: 'net' to query through the PLEXOS .NET API, 'zip' to read the solution zips directly.
     """
-    import System
-
-    # QueryToCSV Inputs
-    append         = True
-    simulation     = SimulationPhaseEnum.LTPlan
-    periodEnum     = getattr(PeriodEnum, f'{period_enum_value}')  
-    collectionEnum = collection_id  # Use collection_id directly
-    parentName     = "" 
-    childName      = ""
-    seriesEnum     = SeriesTypeEnum.Properties
-    timeSliceList  = ""
-    sampleList     = ""
-    modelName      = ""
-    aggregation    = AggregationTypeEnum.CategoryAggregation
-    category       = ""
-    seperator      = ","
-    operation      = OperationTypeEnum.SUM
-
-    # Map collection and property IDs to output filenames (you may need to adjust this mapping)
-    output_filename = f"collection_{collection_id}_property_{property_id}.csv"
-
-    # Common columns for all files
-    columns = ["category_name", "p1", "year", "month", "day", "hour", "value"]
     print(f"Processing collection '{collection_name}' with PeriodEnum {period_enum_value} and sol files: {sol_files}")
+    for sol_file in sol_files:
+        process_solution(sol_file, [(collection_id, collection_name, property_id, default_output_name(collection_id, property_id), False)], input_folder, output_folder, period_enum_value, backend)
 
-    sol = Solution()
+def default_output_name(collection_id, property_id):
+    """
+    Output file name, without extension, of a collection/property with no output name in mappings.json.
+    """
+    return f"collection_{collection_id}_property_{property_id}"
 
-    # Iterate through sol_files
+def build_work_items(mappings, collection_mapping):
+    """
+    Flatten mappings.json into (collection_id, collection_name, property_id, output_name, append) tuples.
+
+    Each collection maps either to a list of property IDs, written to default_output_name files, or to a dict of
+    property ID to {"output": output file name without extension, "mode": one of OUTPUT_MODES}. Each output name
+    can have at most one 'write' entry. Entries in 'append' mode are placed after all 'write' entries so their
+    output file exists, and the first entry of each output name always creates the file so rows are never
+    appended to a file left by an earlier run.
+
+    Args:
+    - mappings: Dict of collection_id (string) to list or dict of property IDs.
+    - collection_mapping: Dict of collection_id to collection name.
+
+    Returns:
+    - work_items: List of (collection_id, collection_name, property_id, output_name, append) tuples.
+    """
+    work_items = []
+    for collection_id_str, properties in mappings.items():
+        collection_id = int(collection_id_str)
+        collection_name = collection_mapping.get(collection_id, f"Collection_{collection_id}")
+        if isinstance(properties, list):
+            properties = {str(property_id): {} for property_id in properties}
+        for property_id_str, entry in properties.items():
+            property_id = int(property_id_str)
+            output_name = entry.get('output', default_output_name(collection_id, property_id))
+            mode = entry.get('mode', 'write')
+            if mode not in OUTPUT_MODES:
+                raise ValueError(f"Invalid mode '{mode}' for collection {collection_id} property {property_id} in mappings.json, "
+                                 f"expected one of {OUTPUT_MODES}")
+            work_items.append((collection_id, collection_name, property_id, output_name, mode == 'append'))
+    # sorted is stable, so entries keep their mappings.json order within each mode
+    work_items = sorted(work_items, key=lambda item: item[4])
+    written = set()
+    for i, (collection_id, collection_name, property_id, output_name, append) in enumerate(work_items):
+        if not append and output_name in written:
+            raise ValueError(f"Output '{output_name}' of collection {collection_id} property {property_id} in mappings.json is "
+                             f"already written by another entry, use \"mode\": \"append\" to add its rows to it")
+        work_items[i] = (collection_id, collection_name, property_id, output_name, output_name in written)
+        written.add(output_name)
+    return work_items
+
+def parse_shard(value):
+    """
+    Parse a '--shard i/N' value into an (index, count) tuple, with 1 <= index <= count.
+    """
+    match = re.fullmatch(r'(\d+)/(\d+)', value)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected i/N with 1 <= i <= N")
+    return int(match.group(1)), int(match.group(2))
+
+def in_shard(solution_name, output_name, shard):
+    """
+    Check if the output file of a solution belongs to a shard.
+
+    The work unit is the output file, so the entries appended to the same output stay together and in order.
+    Units are assigned by a CRC32 of their name, which does not depend on the machine, the listing order of the
+    solutions or the other units.
+    """
+    index, count = shard
+    return zlib.crc32(f"{solution_name}/{output_name}".encode()) % count == index - 1
+
+def shard_manifest_file(shard):
+    """
+    Manifest file, relative to the output folder, written by one shard. Shards write separate manifests so they
+    can run at the same time on a shared filesystem, and merge_shards combines them.
+    """
+    return os.path.join(SHARD_FOLDER, f"manifest_{shard[0]}_of_{shard[1]}.json")
+
+def shard_marker_path(output_folder, period_enum_value, shard):
+    """
+    Path of the completion marker of a shard.
+    """
+    return os.path.join(output_folder, SHARD_FOLDER, f"{period_enum_value}_shard_{shard[0]}_of_{shard[1]}.json")
+
+def write_shard_marker(output_folder, period_enum_value, shard, summaries):
+    """
+    Write the completion marker of a shard, listing the (solution, output) units it completed and the ones
+    that failed.
+    """
+    marker = {'shard': shard[0], 'shards': shard[1], 'period': period_enum_value, 'finished': datetime.now().isoformat(),
+              'completed': sorted([os.path.splitext(os.path.basename(s['sol_file']))[0], output_name]
+                                  for s in summaries for output_name in s['completed']),
+              'errors': [e for s in summaries for e in s['errors']]}
+    marker_path = shard_marker_path(output_folder, period_enum_value, shard)
+    os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+    with open(marker_path, 'w') as f:
+        json.dump(marker, f, indent=4)
+    print(f"Shard {shard[0]}/{shard[1]} completion marker written to {marker_path}")
+
+def merge_shards(sol_files, work_items, output_folder, period_enum_value, shard_count, output_format='csv'):
+    """
+    Verify that every (solution, output) unit of a sharded extraction was completed by its shard, and if so merge
+    the shard manifests into the manifest of the output folder and remove the shard files.
+
+    Args:
+    - sol_files: List of solution files of the extraction.
+    - work_items: List of work items from build_work_items.
+    - output_folder: Path to the output folder.
+    - period_enum_value: 'FiscalYear' or 'Interval'
+    - shard_count: Number of shards N of the '--shard i/N' runs.
+    - output_format: One of OUTPUT_FORMATS.
+
+    Returns:
+    - complete: True if every unit was completed.
+    """
+    shards = [(index, shard_count) for index in range(1, shard_count + 1)]
+    completed = set()
+    missing_markers = []
+    for shard in shards:
+        marker_path = shard_marker_path(output_folder, period_enum_value, shard)
+        if not os.path.exists(marker_path):
+            missing_markers.append(f"{shard[0]}/{shard[1]}")
+            continue
+        with open(marker_path, 'r') as f:
+            completed.update(tuple(unit) for unit in json.load(f)['completed'])
+
+    output_names = sorted({item[3] for item in work_items})
+    missing = []
     for sol_file in sol_files:
-        sol_file_path = os.path.join(input_folder, sol_file)
-        print(sol_file_path)
-        folder_name = "outputs"
-        
-        solution_name = os.path.splitext(sol_file)[0]
-        solution_output_folder = os.path.join(output_folder, period_enum_value, solution_name, folder_name)
-        output_csv_file = os.path.join(solution_output_folder, output_filename)
+        solution_name = os.path.splitext(os.path.basename(sol_file))[0]
+        for output_name in output_names:
+            output_file = os.path.join(output_folder, period_enum_value, solution_name, "outputs", f"{output_name}.{output_format}")
+            if (solution_name, output_name) not in completed or not os.path.isfile(output_file):
+                missing.append(f"{output_file} (shard {[i for i, n in shards if in_shard(solution_name, output_name, (i, n))][0]}/{shard_count})")
 
-        # Check if the solution file exists, delete it if it does
-        if os.path.exists(output_csv_file):
-            os.remove(output_csv_file)  # Deletes the specific solution file
+    if missing_markers:
+        print(f"Shards without a completion marker: {', '.join(missing_markers)}")
+    if missing:
+        print(f"{len(missing)} of {len(sol_files) * len(output_names)} outputs are missing or incomplete:")
+        for output in missing:
+            print(f"  {output}")
+        return False
 
-        os.makedirs(solution_output_folder, exist_ok=True)
+    manifest = load_manifest(output_folder)
+    for shard in shards:
+        update_manifest(manifest, load_manifest(output_folder, shard_manifest_file(shard)))
+    save_manifest(output_folder, manifest)
+    for shard in shards:
+        for path in [os.path.join(output_folder, shard_manifest_file(shard)), shard_marker_path(output_folder, period_enum_value, shard)]:
+            if os.path.exists(path):
+                os.remove(path)
+    shard_folder = os.path.join(output_folder, SHARD_FOLDER)
+    if os.path.isdir(shard_folder) and not os.listdir(shard_folder):
+        os.rmdir(shard_folder)
+    print(f"All {len(sol_files) * len(output_names)} outputs of {shard_count} shards are complete, manifests merged")
+    return True
 
-        sol.Connection(sol_file_path)
-        print(f'Processing {collection_name} (ID: {collection_id}) for {sol_file}...')
+def build_parser():
+    """
+    Build the command line parser. Every option except --config can also be set in the JSON config file,
+    using the option name with underscores as key (e.g. "output_folder": "runs").
+    """
+    parser = argparse.ArgumentParser(description="Extract PLEXOS solution results to Bokeh Pivot CSV files.")
+    parser.add_argument('--config', metavar='FILE',
+                        help="JSON file of option values. Options given on the command line take precedence")
+    parser.add_argument('--period', choices=['FiscalYear', 'Interval'],
+                        help="Period type to extract. Asked for interactively if not given")
+    parser.add_argument('--solutions', default=os.path.join('PlexosSolutions', '*.zip'), metavar='GLOB',
+                        help="Glob of the solution zip files to extract (default: PlexosSolutions/*.zip)")
+    parser.add_argument('--output-folder', default='runs', metavar='FOLDER',
+                        help="Root folder of the extracted outputs (default: runs)")
+    parser.add_argument('--mappings', default='mappings.json', metavar='FILE',
+                        help="Collection/property mappings file (default: mappings.json)")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help=f"Extraction backend, 'net' for the PLEXOS API or 'zip' to read the solution zips directly (default: {DEFAULT_BACKEND})")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of solution files processed in parallel by worker processes (default: 1)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv',
+                        help="Output file format. parquet and feather store typed columns and require pyarrow (default: csv)")
+    parser.add_argument('--year-workers', type=int, default=1,
+                        help="Number of yearly Interval queries run concurrently on separate connections, .NET backend only (default: 1)")
+    parser.add_argument('--memory-limit', type=float, metavar='MB',
+                        help="Stream every query to its output file in chunks of rows converted within about MB megabytes, "
+                             "instead of converting each query result at once")
+    parser.add_argument('--force', action='store_true',
+                        help="Extract every output again, even those the manifest records as up to date")
+    parser.add_argument('--batch', action='store_true',
+                        help="Never wait for the user: errors are only logged to error_log.txt. Requires --period")
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help="Only extract the outputs of shard i of N, for runs spread over several machines")
+    parser.add_argument('--merge-shards', type=int, metavar='N',
+                        help="Verify that all N shards completed, merge their manifests and exit")
+    parser.add_argument('--report', metavar='FILE',
+                        help="Write the settings, phase timings and throughput of the run to a JSON file")
+    return parser
 
-        try:
-            if period_enum_value == "Interval":
-                print('Interval query detected. Partitioning data...')
-                date_from, date_to = find_horizon(sol_file_path)
-                print(f"horizon dates: {date_from}, {date_to}")
-
-                # Partition data by year
-                current_date = date_from
-
-                while current_date <= date_to:
-                    end_of_year = (current_date + relativedelta(years=1)) - timedelta(hours=1)
-                    if end_of_year > date_to:
-                        end_of_year = date_to
-
-                    TS0 = current_date.strftime('%m/%d/%Y %I:%M:%S %p').replace('/0', '/').lstrip("0").replace(" 0", " ")
-                    TS1 = end_of_year.strftime('%m/%d/%Y %I:%M:%S %p').replace('/0', '/').lstrip("0").replace(" 0", " ")
-
-                    start = getattr(getattr(System, "DateTime"), "Parse")(TS0)
-                    end = getattr(getattr(System, "DateTime"), "Parse")(TS1)
-                    print(f'Processing data from {TS0} to {TS1}...')
-
-                    result = sol.QueryToList(
-                        simulation,
-                        collectionEnum,
-                        parentName,
-                        childName,
-                        periodEnum,
-                        seriesEnum,
-                        str(property_id),  # Convert property_id to string
-                        start,
-                        end,
-                        timeSliceList,
-                        sampleList,
-                        modelName,
-                        aggregation,
-                        category,
-                        seperator,
-                        operation
-                    )
-
-                    with open(output_csv_file, 'a', newline='') as csvfile:
-                        csvwriter = csv.writer(csvfile)
-
-                        # Write the header only if the file is being created for the first time
-                        if not os.path.exists(output_csv_file) or os.path.getsize(output_csv_file) == 0:
-                            csvwriter.writerow(columns)
-
-                        for row in result:
-                            try:
-                                row_data = [getattr(row, col, '') for col in ["category_name", "value"]]
-                                row_data.insert(1, "p1")  # Add "p1" in the second column
-
-                                date_str = str(row._date)
-                                date_parts = date_str.split(' ')
-                                date_component = date_parts[0].split('/')
-                                time_component = date_parts[1].split(':') if len(date_parts) > 1 else [0]
-
-                                month = date_component[0]
-                                day = date_component[1]
-                                year = date_component[2]
-                                hour = int(time_component[0])
-
-                                if 'PM' in date_str and hour != 12:
-                                    hour += 12
-                                elif 'AM' in date_str and hour == 12:
-                                    hour = 0
-
-                                row_data.insert(2, year)
-                                row_data.insert(3, month)
-                                row_data.insert(4, day)
-                                row_data.insert(5, hour)
-
-                                csvwriter.writerow(row_data)
-
-                            except Exception as e:
-                                print(f"Error processing row: {e}")
-
-                    print(f'Results saved to {output_csv_file}')
-                    current_date += relativedelta(years=1)
-            else:
-                # Non-interval case
-                print(f'Processing entire horizon for {collection_name} for {sol_file}...')
-                date_from, date_to = find_horizon(sol_file_path)
-                TS0 = date_from.strftime('%m/%d/%Y %I:%M:%S %p').replace('/0', '/').lstrip("0").replace(" 0", " ")
-                TS1 = date_to.strftime('%m/%d/%Y %I:%M:%S %p').replace('/0', '/').lstrip("0").replace(" 0", " ")
-
-                start = getattr(getattr(System, "DateTime"), "Parse")(TS0)
-                end = getattr(getattr(System, "DateTime"), "Parse")(TS1)
-                
-                result = sol.QueryToList(
-                    simulation,
-                    collectionEnum,
-                    parentName,
-                    childName,
-                    periodEnum,
-                    seriesEnum,
-                    str(property_id),  # Convert property_id to string
-                    start,
-                    end,
-                    timeSliceList,
-                    sampleList,
-                    modelName,
-                    aggregation,
-                    category,
-                    seperator,
-                    operation
-                )
-
-                with open(output_csv_file, 'a', newline='') as csvfile:
-                    csvwriter = csv.writer(csvfile)
-
-                    # Write the header only if the file is being created for the first time
-                    if not os.path.exists(output_csv_file) or os.path.getsize(output_csv_file) == 0:
-                        csvwriter.writerow(columns)
-
-                    for row in result:
-                        try:
-                            row_data = [getattr(row, col, '') for col in ["category_name", "value"]]
-                            row_data.insert(1, "p1")  # Add "p1" in the second column
-
-                            date_str = str(row._date)
-                            date_parts = date_str.split(' ')
-                            date_component = date_parts[0].split('/')
-                            time_component = date_parts[1].split(':') if len(date_parts) > 1 else [0]
-
-                            month = date_component[0]
-                            day = date_component[1]
-                            year = date_component[2]
-                            hour = int(time_component[0])
-
-                            if 'PM' in date_str and hour != 12:
-                                hour += 12
-                            elif 'AM' in date_str and hour == 12:
-                                hour = 0
-
-                            row_data.insert(2, year)
-                            row_data.insert(3, month)
-                            row_data.insert(4, day)
-                            row_data.insert(5, hour)
-
-                            csvwriter.writerow(row_data)
-
-                        except Exception as e:
-                            print(f"Error processing row: {e}")
-
-                print(f'Results saved to {output_csv_file}')
+def check_config(parser, config, config_file):
+    """
+    Check the options of a JSON config file as the parser checks them on the command line, since values set as
+    parser defaults bypass it: keys must be options of the parser, values are converted with the type of their
+    option and must be one of its choices, and flags must be true or false. Exits through parser.error otherwise.
 
-        except Exception as e:
-            error_message = f"Error processing {collection_name} for {sol_file_path}: {e}"
-            print(error_message)
-            error_file = "error_log.txt"
-            with open(error_file, "a") as f:
-                f.write(f"Error processing {collection_name} for {sol_file_path}: {e}\n")
-                f.write(traceback.format_exc() + "\n")
-            input('Press any key to continue...')
-        finally:
-            sol.Close()
+    Args:
+    - parser: Parser from build_parser.
+    - config: Dict of option values loaded from the config file.
+    - config_file: Path to the config file, for error messages.
+
+    Returns:
+    - config: Dict of converted option values.
+    """
+    actions = {action.dest: action for action in parser._actions if action.dest not in ('help', 'config')}
+    unknown = sorted(set(config) - set(actions))
+    if unknown:
+        parser.error(f"Unknown option(s) in {config_file}: {', '.join(unknown)}")
+    checked = {}
+    for key, value in config.items():
+        action = actions[key]
+        if isinstance(action, argparse._StoreTrueAction):
+            if not isinstance(value, bool):
+                parser.error(f"Option '{key}' in {config_file} must be true or false, got {value!r}")
+        elif value is not None:
+            if isinstance(value, (bool, list, dict)) or (action.type is None and not isinstance(value, str)):
+                parser.error(f"Invalid value {value!r} of option '{key}' in {config_file}")
+            if action.type is not None:
+                try:
+                    value = action.type(str(value))
+                except (ValueError, TypeError, argparse.ArgumentTypeError) as e:
+                    parser.error(f"Invalid value {value!r} of option '{key}' in {config_file}: {e}")
+            if action.choices is not None and value not in action.choices:
+                parser.error(f"Invalid value {value!r} of option '{key}' in {config_file}, expected one of {list(action.choices)}")
+        checked[key] = value
+    return checked
+
+def parse_args(argv=None):
+    """
+    Parse the command line, with defaults taken from the --config file if one is given.
+
+    Args:
+    - argv: List of arguments, sys.argv[1:] if None.
+
+    Returns:
+    - args: argparse.Namespace of option values.
+    """
+    parser = build_parser()
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument('--config')
+    config_args, _ = config_parser.parse_known_args(argv)
+    if config_args.config:
+        with open(config_args.config, 'r') as f:
+            config = json.load(f)
+        parser.set_defaults(**check_config(parser, config, config_args.config))
+    args = parser.parse_args(argv)
+    if args.batch and not args.period:
+        parser.error("--batch requires --period")
+    if args.memory_limit is not None:
+        if args.memory_limit <= 0:
+            parser.error("--memory-limit must be positive")
+        if args.year_workers > 1:
+            parser.error("--memory-limit cannot be used with --year-workers, which holds a whole year per query")
+    if args.merge_shards is not None:
+        if args.merge_shards < 1:
+            parser.error("--merge-shards must be at least 1")
+        if args.shard:
+            parser.error("--merge-shards cannot be used with --shard")
+        if not args.period:
+            parser.error("--merge-shards requires --period")
+    if args.backend == 'net' and not HAS_PLEXOS_NET:
+        parser.error("The 'net' backend requires pythonnet and the PLEXOS API. Use --backend zip instead.")
+    return args
+
+def write_report(report_file, args, summaries, timings, elapsed):
+    """
+    Write the settings, phase timings and throughput of a run to a JSON file.
+    """
+    rows = sum(s['rows'] for s in summaries)
+    report = {
+        'settings': {key: value for key, value in vars(args).items() if key != 'report'},
+        'solutions': len(summaries),
+        'queries': sum(s['queries'] for s in summaries),
+        'rows': rows,
+        'skipped': sum(s['skipped'] for s in summaries),
+        'errors': [e for s in summaries for e in s['errors']],
+        'elapsed': elapsed,
+        'rows_per_second': rows / elapsed if elapsed else 0,
+        'peak_memory': max([s['peak_memory'] for s in summaries if s.get('peak_memory')], default=None),
+        'timings': timings,
+    }
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Run report written to {report_file}")
 
 def main():
+    args = parse_args()
+    workers = max(1, args.workers)
+    interactive = not args.batch
+
     # Check if mappings.json exists
-    if not os.path.exists('mappings.json'):
-        print("mappings.json not found. Please run the mapping script to generate mappings.json.")
-        input('Press any key to exit...')
-        sys.exit()
+    if not os.path.exists(args.mappings):
+        print(f"{args.mappings} not found. Please run the mapping script to generate mappings.json.")
+        if interactive:
+            input('Press any key to exit...')
+        sys.exit(1)
 
     # Read mappings.json
-    with open('mappings.json', 'r') as f:
+    with open(args.mappings, 'r') as f:
         mappings = json.load(f)
 
     # Parse CollectionEnum to get collection mapping
@@ -472,33 +1318,78 @@ def main():
     '''
     collection_mapping = parse_collection_enum(collection_enum_str)
 
-    # Declare the collections to process from mappings.json
-    collections = mappings  # This is a dictionary with collection_ids as keys
+    # Declare the collection/property queries to process from mappings.json
+    work_items = build_work_items(mappings, collection_mapping)
 
-    # Get input and output folder paths
-    input_folder = "PlexosSolutions"
-    output_folder = "runs"
+    # Solution files are given by a glob, so they are passed with their path and an empty input folder
+    input_folder = ""
+    output_folder = args.output_folder
 
-    sol_files = [f for f in os.listdir(input_folder) if f.endswith('.zip')]
+    sol_files = sorted(glob.glob(args.solutions))
 
     # Check if there are no solution files
     if not sol_files:
-        print(f'No solution files found in {input_folder}. Exiting...')
-        input('Press any key to continue...')
+        print(f'No solution files found for {args.solutions}. Exiting...')
+        if interactive:
+            input('Press any key to continue...')
+        sys.exit(1)
     else:
         try:
-            print("Please enter 'FiscalYear' or 'Interval' ")
-            period_enum_value = input()
-            for collection_id_str, properties in collections.items():
-                collection_id = int(collection_id_str)
-                collection_name = collection_mapping.get(collection_id, f"Collection_{collection_id}")
-                for property_id in properties:
-                    print(f"Processing property {property_id} for collection {collection_name} (ID: {collection_id})")
-                    process_collection_chunk(collection_id, collection_name, input_folder, output_folder, sol_files, property_id, period_enum_value)
-            print("Appending '_append' files to corresponding CSVs...")
-            append_files(output_folder)
+            period_enum_value = args.period
+            if not period_enum_value:
+                print("Please enter 'FiscalYear' or 'Interval' ")
+                period_enum_value = input()
+            if args.merge_shards:
+                if not merge_shards(sol_files, work_items, output_folder, period_enum_value, args.merge_shards, args.format):
+                    sys.exit(1)
+                return
+            print(f"Using the '{args.backend}' extraction backend")
+            if args.memory_limit:
+                print(f"Streaming outputs in chunks of {chunk_rows_for(args.memory_limit, args.format)} rows "
+                      f"({args.memory_limit:g} MB memory limit)")
+            # The manifest records which outputs are up to date. It is saved after each solution, so an interrupted
+            # run resumes where it stopped. A shard reads the manifest of the output folder and its own, and only
+            # writes its own.
+            manifest = load_manifest(output_folder)
+            manifest_file = MANIFEST_FILE
+            if args.shard:
+                print(f"Extracting shard {args.shard[0]}/{args.shard[1]}")
+                manifest_file = shard_manifest_file(args.shard)
+                update_manifest(manifest, load_manifest(output_folder, manifest_file))
+            lookup_manifest = empty_manifest() if args.force else manifest
+
+            def record_summary(summary):
+                update_manifest(manifest, summary['manifest'])
+                save_manifest(output_folder, manifest, manifest_file)
+
+            # Solution-major: each solution is opened once and all mapped properties are extracted from it
+            timings = {}
+            start = time.perf_counter()
+            if workers > 1:
+                print(f"Processing {len(sol_files)} solutions with {workers} workers")
+                summaries = process_solutions_parallel(sol_files, work_items, input_folder, output_folder, period_enum_value, workers, args.backend, timings,
+                                                       args.format, lookup_manifest, record_summary, args.year_workers, args.shard,
+                                                       args.memory_limit)
+            else:
+                summaries = []
+                for sol_file in sol_files:
+                    summary = process_solution(sol_file, work_items, input_folder, output_folder, period_enum_value, args.backend, timings,
+                                               interactive, args.format, lookup_manifest, args.year_workers, args.shard,
+                                               args.memory_limit)
+                    record_summary(summary)
+                    summaries.append(summary)
+            elapsed = time.perf_counter() - start
+            report_throughput(summaries, elapsed)
+            report_timings(timings)
+            if args.shard:
+                write_shard_marker(output_folder, period_enum_value, args.shard, summaries)
+            if args.report:
+                write_report(args.report, args, summaries, timings, elapsed)
+            if any(summary['errors'] for summary in summaries):
+                sys.exit(1)
         except Exception as e:
             print(f"Execution failed with error: {e}")
+            sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -26,6 +26,9 @@ import bokeh.palettes as bpa
 import bokeh.resources as br
 import bokeh.embed as be
 import datetime
+import hashlib
+import threading
+import weakref
 import six.moves.urllib.parse as urlp
 import subprocess as sp
 import jinja2 as ji
@@ -83,6 +86,28 @@ MAP_LINE_WIDTH = 2
 RANGE_OPACITY_MULT = 0.3
 RANGE_GLYPH_MAP = {'Line': 'Area', 'Dot': 'Bar', 'Dot-Line': 'Area'}
 
+#Memo of the output of each stage of set_df_plots, keyed by a hash of the id of df_source and of the widget values the
+#stage and the stages before it depend on, so sessions with different sources never share outputs. Values are
+#(dataframe, bytes, source id) tuples, with None for outputs that are df_source itself, and least recently used
+#outputs are dropped once the cache exceeds PIPELINE_CACHE_MAX_MB. 'sources' holds the ids of the sources with
+#outputs in the cache, whose outputs are dropped when the source is garbage collected, before its id can be reused.
+PIPELINE_CACHE_MAX_MB = 1024
+PIPELINE_CACHE = {'sources': set(), 'dfs': collections.OrderedDict(), 'bytes': 0, 'hits': 0, 'misses': 0}
+PIPELINE_CACHE_LOCK = threading.Lock()
+#Widgets whose values each stage of set_df_plots depends on, in order of the stages. The filter stage also depends on
+#the filter widgets, the aggregate stage on sync_axes for histograms, and the sort stage on custom sorts. Other widgets
+#only adjust figures and maps.
+PIPELINE_STAGE_WDG = collections.OrderedDict((
+    ('filter', []),
+    ('aggregate', ['series', 'series_limit', 'y', 'y_agg', 'x', 'x_group', 'explode', 'explode_group', 'y_b', 'y_c',
+        'range', 'hist_weight', 'hist_num_bins']),
+    ('ops', ['adv_op', 'adv_col', 'adv_col_base', 'adv_op2', 'adv_col2', 'adv_col_base2', 'adv_op3', 'adv_col3',
+        'adv_col_base3', 'y', 'y_agg', 'range']),
+    ('scale', ['chart_type', 'map_arrows', 'x', 'y', 'x_scale', 'y_scale']),
+    ('sort', ['cum_sort', 'net_levels', 'chart_type', 'sort_data', 'series', 'x', 'x_group', 'explode', 'explode_group',
+        'y', 'range']),
+))
+
 #List of widgets that use columns as their selectors
 WDG_COL = ['x', 'y', 'x_group', 'series', 'explode', 'explode_group']
 
@@ -453,9 +478,58 @@ def get_df_csv(data_source):
     cols['seriesable'] = cols['filterable']
     df_source[cols['discrete']] = df_source[cols['discrete']].fillna('{BLANK}')
     df_source[cols['continuous']] = df_source[cols['continuous']].fillna(0)
+    categorize_discrete(df_source, cols['discrete'])
     logger.info('***Done fetching csv(s).')
     return (df_source, cols)
 
+def categorize_discrete(df, discrete_cols, custom_sorts={}):
+    '''
+    Convert discrete columns of a dataframe to pandas categoricals, in place. Categories of columns with a custom
+    sort follow that order (with values that are not in it at the end), and categories of other columns are sorted,
+    so sorting on a column gives the same order as before. Grouping, filtering and sorting on categoricals works on
+    their integer codes instead of on strings.
+
+    Args:
+        df (pandas dataframe): Dataframe with discrete columns already filled.
+        discrete_cols (list): Names of discrete columns of df.
+        custom_sorts (dict): Keys are column names. Values are lists of values in the desired sort order.
+
+    Returns:
+        df (pandas dataframe): The same dataframe, with discrete columns as categoricals.
+    '''
+    for col in discrete_cols:
+        if col in custom_sorts:
+            values = df[col].unique().tolist()
+            present = set(values)
+            categories = [v for v in dict.fromkeys(custom_sorts[col]) if v in present]
+            ordered = set(categories)
+            categories += [v for v in values if v not in ordered]
+            df[col] = pd.Categorical(df[col], categories=categories)
+        else:
+            df[col] = df[col].astype('category')
+    return df
+
+def is_categorical(series):
+    '''
+    Return True if a pandas series is a categorical.
+    '''
+    return isinstance(series.dtype, pd.CategoricalDtype)
+
+def add_category(df, col, value):
+    '''
+    Add a value to the categories of a categorical column of a dataframe, in place, so it can be assigned to rows.
+    If the categories are sorted, the value is inserted in its sorted position, otherwise it is added at the end.
+    '''
+    if is_categorical(df[col]) and value not in df[col].cat.categories:
+        categories = df[col].cat.categories.tolist()
+        if df[col].cat.categories.is_monotonic_increasing:
+            try:
+                df[col] = df[col].cat.set_categories(sorted(categories + [value]))
+                return
+            except TypeError:
+                pass
+        df[col] = df[col].cat.add_categories([value])
+
 def get_wdg_csv():
     '''
     Create report widgets for csv file.
@@ -720,6 +794,9 @@ def save_wdg_defaults(wdg, wdg_defaults):
 def set_df_plots(df_source, cols, wdg, custom_sorts={}):
     '''
     Apply filters, scaling, aggregation, and sorting to source dataframe, and return the result.
+    This is done in the stages of PIPELINE_STAGE_WDG. The output of each stage is kept in PIPELINE_CACHE under a hash
+    of the widget values it depends on and of the key of the previous stage, so that a change to a widget only
+    reruns the stages from the first one that depends on it, and widgets that only adjust the figures rerun none.
 
     Args:
         df_source (pandas dataframe): Dataframe of the csv source.
@@ -728,53 +805,145 @@ def set_df_plots(df_source, cols, wdg, custom_sorts={}):
         custom_sorts (dict): Keys are column names. Values are lists of values in the desired sort order.
 
     Returns:
-        df_plots (pandas dataframe): df_source after having been filtered, scaled, aggregated, and sorted.
+        df_plots (pandas dataframe): df_source after having been filtered, scaled, aggregated, and sorted. It may be
+            shared with PIPELINE_CACHE, so it must not be modified in place. When no stage changes df_source, a
+            shallow copy of df_source is returned, so adding or replacing its columns leaves df_source as it was.
     '''
     logger.info('***Filtering, Scaling, Aggregating, Adv Operations, Sorting...')
     startTime = datetime.datetime.now()
-    df_plots = df_source.copy()
+    source_id = id(df_source)
+    with PIPELINE_CACHE_LOCK:
+        if source_id not in PIPELINE_CACHE['sources']:
+            PIPELINE_CACHE['sources'].add(source_id)
+            weakref.finalize(df_source, drop_pipeline_source, source_id)
+    stages = [('filter', filter_df_plots), ('aggregate', aggregate_df_plots), ('ops', operate_df_plots),
+        ('scale', scale_df_plots), ('sort', sort_df_plots)]
+    key = repr((source_id, cols))
+    df_plots = df_source
+    cached = []
+    for stage, stage_func in stages:
+        values = [wdg[w].value for w in PIPELINE_STAGE_WDG[stage]]
+        if stage == 'filter':
+            values += [wdg['filter_'+str(j)].active for j in range(len(cols['filterable']))]
+        elif stage == 'aggregate' and wdg['x'].value == 'histogram_x':
+            values.append(wdg['sync_axes'].value)
+        elif stage == 'sort':
+            values += [(c, custom_sorts[c]) for c in cols['all'] if c in custom_sorts]
+        key = hashlib.sha1(repr((key, stage, values)).encode()).hexdigest()
+        with PIPELINE_CACHE_LOCK:
+            if key in PIPELINE_CACHE['dfs']:
+                PIPELINE_CACHE['hits'] += 1
+                PIPELINE_CACHE['dfs'].move_to_end(key)
+                df_stage = PIPELINE_CACHE['dfs'][key][0]
+                if df_stage is None:
+                    df_stage = df_source
+            else:
+                PIPELINE_CACHE['misses'] += 1
+                df_stage = None
+        if df_stage is None:
+            df_stage = stage_func(df_plots, cols, wdg, custom_sorts)
+            put_pipeline_cache(key, df_stage, df_source, df_stage is df_plots)
+        else:
+            cached.append(stage)
+        df_plots = df_stage
+        if stage == 'filter' and df_plots.empty:
+            return df_plots.copy(deep=False) if df_plots is df_source else df_plots
+    logger.info('***Done Filtering, Scaling, Aggregating, Adv Operations, Sorting: '+ str(datetime.datetime.now() - startTime) +
+        ' (cached stages: ' + (', '.join(cached) if cached else 'none') + ')')
+    if wdg['render_plots'].value == 'No':
+        logger.info('***Ready for download!')
+    if df_plots is df_source:
+        df_plots = df_source.copy(deep=False)
+    return df_plots
 
-    #Apply filters
-    for j, col in enumerate(cols['filterable']):
-        active = [wdg['filter_'+str(j)].labels[i] for i in wdg['filter_'+str(j)].active]
-        if col in cols['continuous']:
-            active = np.asarray(active)
-            active = active.astype(df_plots[col].dtype)
-            active = active.tolist()
-        df_plots = df_plots[df_plots[col].isin(active)]
+def put_pipeline_cache(key, df_stage, df_source, shared=False):
+    '''
+    Store the output of a stage of set_df_plots in PIPELINE_CACHE, and drop least recently used outputs once the
+    cache exceeds PIPELINE_CACHE_MAX_MB. Outputs that are df_source itself, or the unchanged input of their stage
+    (shared), take no memory of their own. df_source itself is stored as None, so the cache never keeps it alive.
+    '''
+    if shared or df_stage is df_source:
+        nbytes = 0
+    else:
+        nbytes = df_stage.memory_usage(index=True, deep=True).sum()
+    if nbytes > PIPELINE_CACHE_MAX_MB * 1024**2:
+        return
+    with PIPELINE_CACHE_LOCK:
+        if key not in PIPELINE_CACHE['dfs'] and id(df_source) in PIPELINE_CACHE['sources']:
+            PIPELINE_CACHE['dfs'][key] = (None if df_stage is df_source else df_stage, nbytes, id(df_source))
+            PIPELINE_CACHE['bytes'] += nbytes
+        while PIPELINE_CACHE['bytes'] > PIPELINE_CACHE_MAX_MB * 1024**2:
+            PIPELINE_CACHE['bytes'] -= PIPELINE_CACHE['dfs'].popitem(last=False)[1][1]
 
-    if df_plots.empty:
-        return df_plots
+def drop_pipeline_source(source_id):
+    '''
+    Drop the outputs of PIPELINE_CACHE that were computed from the source with id source_id, once that source has
+    been garbage collected.
+    '''
+    with PIPELINE_CACHE_LOCK:
+        for key in [k for k, v in PIPELINE_CACHE['dfs'].items() if v[2] == source_id]:
+            PIPELINE_CACHE['bytes'] -= PIPELINE_CACHE['dfs'].pop(key)[1]
+        PIPELINE_CACHE['sources'].discard(source_id)
+
+def clear_pipeline_cache():
+    '''
+    Empty PIPELINE_CACHE, e.g. before profiling set_df_plots.
+    '''
+    with PIPELINE_CACHE_LOCK:
+        PIPELINE_CACHE['dfs'].clear()
+        PIPELINE_CACHE['bytes'] = 0
 
+def get_groupby_cols(wdg):
+    '''
+    Return the columns that aggregation (or the histogram, without x_group) groups by, outermost first.
+    '''
+    groupby_cols = [wdg['x'].value]
+    if wdg['x_group'].value != 'None' and wdg['x'].value != 'histogram_x': groupby_cols = [wdg['x_group'].value] + groupby_cols
+    if wdg['series'].value != 'None': groupby_cols = [wdg['series'].value] + groupby_cols
+    if wdg['explode'].value != 'None': groupby_cols = [wdg['explode'].value] + groupby_cols
+    if wdg['explode_group'].value != 'None': groupby_cols = [wdg['explode_group'].value] + groupby_cols
+    return groupby_cols
+
+#Stages of set_df_plots. Each one takes the output of the previous stage, which it must not modify in place, as it
+#may be cached. Their arguments are (df_plots, cols, wdg, custom_sorts), and df_plots of filter_df_plots is df_source.
+
+def filter_df_plots(df_source, cols, wdg, custom_sorts):
+    '''
+    Apply filters, selecting the rows of df_source in a single pass.
+    '''
+    filter_mask = get_filter_mask(df_source, cols, wdg)
+    if filter_mask is None:
+        return df_source
+    return df_source[filter_mask]
+
+def aggregate_df_plots(df_plots, cols, wdg, custom_sorts):
+    '''
+    Limit the number of series, and aggregate or make a histogram.
+    '''
     #Limit number of series if indicated
     if wdg['series'].value != 'None' and wdg['series_limit'].value.isdigit():
         df_top = df_plots[[wdg['series'].value, wdg['y'].value]].copy()
         df_top[wdg['y'].value] = df_top[wdg['y'].value].abs()
-        df_top = df_top.groupby([wdg['series'].value], sort=False, as_index=False).sum()
+        df_top = df_top.groupby([wdg['series'].value], sort=False, observed=True, as_index=False).sum()
         df_top = df_top.sort_values(by=[wdg['y'].value], ascending=False)
         top_series = df_top.head(int(wdg['series_limit'].value))[wdg['series'].value].tolist()
+        #Only the series column is modified, so it is the only column copied. Assigning the copy to a shallow copy
+        #of df_plots either replaces the column or writes the same values, so df_plots itself is left unchanged.
+        df_plots = df_plots.copy(deep=False)
+        df_plots[wdg['series'].value] = df_plots[wdg['series'].value].copy()
+        add_category(df_plots, wdg['series'].value, 'Other')
         df_plots.loc[~df_plots[wdg['series'].value].isin(top_series), wdg['series'].value] = 'Other'
 
     #Apply Aggregation
     if wdg['y'].value in cols['continuous'] and wdg['y_agg'].value != 'None' and wdg['x'].value != 'histogram_x':
-        groupby_cols = [wdg['x'].value]
-        if wdg['x_group'].value != 'None': groupby_cols = [wdg['x_group'].value] + groupby_cols
-        if wdg['series'].value != 'None': groupby_cols = [wdg['series'].value] + groupby_cols
-        if wdg['explode'].value != 'None': groupby_cols = [wdg['explode'].value] + groupby_cols
-        if wdg['explode_group'].value != 'None': groupby_cols = [wdg['explode_group'].value] + groupby_cols
-        df_grouped = df_plots.groupby(groupby_cols, sort=False)
-        df_plots = df_grouped.apply(apply_aggregation, wdg['y_agg'].value, wdg['y'].value, wdg['y_b'].value, wdg['y_c'].value, wdg['range'].value).reset_index()
-        #The index of each group's dataframe is added as another column it seems. So we need to remove it:
-        df_plots.drop(df_plots.columns[len(groupby_cols)], axis=1, inplace=True)
+        groupby_cols = get_groupby_cols(wdg)
+        df_plots = aggregate_groups(df_plots, groupby_cols, wdg['y_agg'].value, wdg['y'].value, wdg['y_b'].value, wdg['y_c'].value, wdg['range'].value)
 
     #Make histogram
     if wdg['x'].value == 'histogram_x':
         weights = df_plots[wdg['y'].value] if  wdg['hist_weight'].value == 'Yes' else None
         yhist, binedges = np.histogram(df_plots[wdg['y'].value], bins=int(wdg['hist_num_bins'].value), weights=weights)
-        groupby_cols = []
-        if wdg['series'].value != 'None': groupby_cols = [wdg['series'].value] + groupby_cols
-        if wdg['explode'].value != 'None': groupby_cols = [wdg['explode'].value] + groupby_cols
-        if wdg['explode_group'].value != 'None': groupby_cols = [wdg['explode_group'].value] + groupby_cols
+        groupby_cols = get_groupby_cols(wdg)[:-1]
         if groupby_cols == []:
             bincenters = np.mean(np.vstack([binedges[0:-1],binedges[1:]]), axis=0)
             df_plots = pd.DataFrame({wdg['x'].value: bincenters, wdg['y'].value: yhist})
@@ -787,23 +956,35 @@ def set_df_plots(df_source, cols, wdg, custom_sorts={}):
                     yhist, binedges = np.histogram(group[wdg['y'].value], bins=int(wdg['hist_num_bins'].value), weights=weights)
                 bincenters = np.mean(np.vstack([binedges[0:-1],binedges[1:]]), axis=0)
                 return pd.DataFrame({wdg['x'].value: bincenters, wdg['y'].value: yhist})
-            df_grouped = df_plots.groupby(groupby_cols, sort=False)
+            df_grouped = df_plots.groupby(groupby_cols, sort=False, observed=True)
             df_plots = df_grouped.apply(group_apply_hist, binedges).reset_index()
             df_plots.drop(df_plots.columns[len(groupby_cols)], axis=1, inplace=True)
-        groupby_cols += [wdg['x'].value]
-
-    #Check for range chart
-    range_cols = []
-    if wdg['range'].value == 'Within Series':
-        range_cols = ['range_min', 'range_max']
+    return df_plots
 
-    #Do Advanced Operations
+def operate_df_plots(df_plots, cols, wdg, custom_sorts):
+    '''
+    Do Advanced Operations.
+    '''
     df_plots = do_op(df_plots, wdg, cols, '')
     df_plots = do_op(df_plots, wdg, cols, '2')
     df_plots = do_op(df_plots, wdg, cols, '3')
+    return df_plots
+
+def scale_df_plots(df_plots, cols, wdg, custom_sorts):
+    '''
+    Flip arrows of line maps and scale axes.
+    '''
+    arrows = wdg['chart_type'].value == 'Line Map' and wdg['map_arrows'].value == 'Yes'
+    x_scale = wdg['x_scale'].value != '' and wdg['x'].value in cols['continuous'] + ['histogram_x']
+    y_scale = wdg['y_scale'].value != '' and wdg['y'].value in cols['continuous']
+    if not (arrows or x_scale or y_scale):
+        return df_plots
+    df_plots = df_plots.copy()
 
     #For arrow maps, flip the x axis when there are negatives so that all values are positive in the correct direction.
-    if wdg['chart_type'].value == 'Line Map' and wdg['map_arrows'].value == 'Yes':
+    if arrows:
+        #Flipped values may not be categories of x, so work on plain strings
+        df_plots[wdg['x'].value] = df_plots[wdg['x'].value].astype(object)
         df_plots[['temp_from','temp_to']] = df_plots[wdg['x'].value].str.split('-',expand=True)
         idx_neg = df_plots[wdg['y'].value] < 0
         df_plots.loc[idx_neg, wdg['x'].value] = df_plots.loc[idx_neg, 'temp_to'] + '-' + df_plots.loc[idx_neg, 'temp_from']
@@ -811,10 +992,20 @@ def set_df_plots(df_source, cols, wdg, custom_sorts={}):
         df_plots.drop(['temp_from','temp_to'], axis='columns',inplace=True)
 
     #Scale Axes
-    if wdg['x_scale'].value != '' and wdg['x'].value in cols['continuous'] + ['histogram_x']:
+    if x_scale:
         df_plots[wdg['x'].value] = df_plots[wdg['x'].value] * float(wdg['x_scale'].value)
-    if wdg['y_scale'].value != '' and wdg['y'].value in cols['continuous']:
+    if y_scale:
         df_plots[wdg['y'].value] = df_plots[wdg['y'].value] * float(wdg['y_scale'].value)
+    return df_plots
+
+def sort_df_plots(df_plots, cols, wdg, custom_sorts):
+    '''
+    Sort, by cumulative y value if indicated, add net levels, and rearrange the column order.
+    '''
+    #Check for range chart
+    range_cols = []
+    if wdg['range'].value == 'Within Series':
+        range_cols = ['range_min', 'range_max']
 
     #For cum_sort set to "Ascending" or "Descending" we will sort by cumulative y value.
     #If net levels are shown, we must also calculate cumulative y value.
@@ -823,9 +1014,9 @@ def set_df_plots(df_source, cols, wdg, custom_sorts={}):
     net_level_col = []
     if cum_sort_cond or net_level_cond:
         #adjust groupby_cols from Aggregation section above, and remove series from group if it is there
-        net_group_cols = [c for c in groupby_cols if c != wdg['series'].value]
+        net_group_cols = [c for c in get_groupby_cols(wdg) if c != wdg['series'].value]
         #group and sum across series to get the cumulative y for each x
-        df_net_group = df_plots.groupby(net_group_cols, sort=False)
+        df_net_group = df_plots.groupby(net_group_cols, sort=False, observed=True)
         df_net = df_net_group[wdg['y'].value].sum().reset_index()
         if cum_sort_cond:
             df_cum = df_net.rename(columns={wdg['y'].value: 'y_cumulative'})
@@ -841,6 +1032,7 @@ def set_df_plots(df_source, cols, wdg, custom_sorts={}):
 
     #Sort Dataframe
     sortby_cols = []
+    drop_cols = []
     if wdg['sort_data'].value == 'Yes':
         sortby_cols = [wdg['x'].value]
         if wdg['x_group'].value != 'None': sortby_cols = [wdg['x_group'].value] + sortby_cols
@@ -848,38 +1040,93 @@ def set_df_plots(df_source, cols, wdg, custom_sorts={}):
         if cum_sort_cond: sortby_cols = ['y_cumulative'] + sortby_cols
         if wdg['explode'].value != 'None': sortby_cols = [wdg['explode'].value] + sortby_cols
         if wdg['explode_group'].value != 'None': sortby_cols = [wdg['explode_group'].value] + sortby_cols
-        #Add custom sort columns
+        #Build one array of sort keys per sort column apart from df_plots, with positions in the custom sort for
+        #columns with custom sorts, and category codes (which follow the category order) for categorical columns
         temp_sort_cols = sortby_cols[:]
-        for col in custom_sorts:
-            if col in sortby_cols:
-                df_plots[col + '__sort_col'] = df_plots[col].map(lambda x: custom_sorts[col].index(x))
+        sort_keys = []
+        for col in sortby_cols:
+            if col in custom_sorts:
+                if is_categorical(df_plots[col]):
+                    #Only the categories are mapped, so drop the ones that no longer appear
+                    sort_col = df_plots[col].cat.remove_unused_categories()
+                    positions = np.array([custom_sorts[col].index(x) for x in sort_col.cat.categories], dtype=int)
+                    sort_keys.append(positions[sort_col.cat.codes.values])
+                else:
+                    sort_keys.append(df_plots[col].map(lambda x: custom_sorts[col].index(x)).values)
                 temp_sort_cols[sortby_cols.index(col)] = col + '__sort_col'
-        #Do sorting
-        df_plots = df_plots.sort_values(temp_sort_cols).reset_index(drop=True)
+            elif is_categorical(df_plots[col]):
+                sort_keys.append(df_plots[col].cat.codes.values)
+            else:
+                sort_keys.append(df_plots[col].values)
+        #Do sorting (np.lexsort sorts by the last key first), replacing the index in place rather than copying the
+        #sorted rows again with reset_index
+        order = np.lexsort(sort_keys[::-1])
+        df_plots = df_plots.take(order)
+        df_plots.index = pd.RangeIndex(len(df_plots))
         # Remove leading zeros (sometime used for sorting integers)
         for col in temp_sort_cols:
+            if col not in df_plots:
+                continue
+            if is_categorical(df_plots[col]):
+                #Strip the categories instead, unless that would merge some of them
+                categories = [str(c).lstrip('0') for c in df_plots[col].cat.categories]
+                if len(set(categories)) == len(categories):
+                    df_plots[col] = df_plots[col].cat.rename_categories(categories)
+                continue
+            #Numbers converted to strings have no leading zeros to strip
+            if pd.api.types.is_numeric_dtype(df_plots[col]):
+                continue
             original_dtype = df_plots[col].dtype
             try:
                 df_plots[col] = df_plots[col].astype(str).str.lstrip('0').astype(original_dtype)
             except ValueError:
                 pass
-        #Remove custom sort columns
-        for col in custom_sorts:
-            if col in sortby_cols:
-                df_plots = df_plots.drop(col + '__sort_col', axis=1)
         if cum_sort_cond:
-            df_plots = df_plots.drop('y_cumulative', axis=1)
+            #y_cumulative is dropped by leaving it out of the column order below
             sortby_cols.remove('y_cumulative')
+            drop_cols = ['y_cumulative']
 
-    #Rearrange column order for csv download
+    #Rearrange column order for csv download, only if it changes
     sorted_cols = sortby_cols + [wdg['y'].value] + range_cols + net_level_col
-    unsorted_columns = [col for col in df_plots.columns if col not in sorted_cols]
-    df_plots = df_plots[unsorted_columns + sorted_cols]
-    logger.info('***Done Filtering, Scaling, Aggregating, Adv Operations, Sorting: '+ str(datetime.datetime.now() - startTime))
-    if wdg['render_plots'].value == 'No':
-        logger.info('***Ready for download!')
+    unsorted_columns = [col for col in df_plots.columns if col not in sorted_cols + drop_cols]
+    columns = unsorted_columns + sorted_cols
+    if columns != df_plots.columns.tolist():
+        df_plots = df_plots[columns]
     return df_plots
 
+def get_filter_mask(df_source, cols, wdg):
+    '''
+    Combine the filter widgets of all filterable columns into one boolean mask of the rows of df_source.
+    Filters with all values selected are skipped. Categorical columns are filtered through their integer codes,
+    by first selecting among their categories, and other columns with isin.
+
+    Args:
+        df_source (pandas dataframe): Dataframe of the csv source.
+        cols (dict): Keys are categories of columns of df_source, and values are a list of columns of that category.
+        wdg (ordered dict): Dictionary of bokeh model widgets.
+
+    Returns:
+        filter_mask (numpy array): Boolean array with True for rows to keep, or None if no filter removes any value.
+    '''
+    filter_mask = None
+    for j, col in enumerate(cols['filterable']):
+        wdg_filter = wdg['filter_'+str(j)]
+        if len(set(wdg_filter.active)) == len(wdg_filter.labels):
+            continue
+        active = [wdg_filter.labels[i] for i in wdg_filter.active]
+        if col in cols['continuous']:
+            active = np.asarray(active)
+            active = active.astype(df_source[col].dtype)
+            active = active.tolist()
+        if is_categorical(df_source[col]):
+            #Code -1 (missing) picks the trailing False
+            selected = np.append(df_source[col].cat.categories.isin(active), False)
+            col_mask = selected[df_source[col].cat.codes.values]
+        else:
+            col_mask = df_source[col].isin(active).values
+        filter_mask = col_mask if filter_mask is None else filter_mask & col_mask
+    return filter_mask
+
 def do_op(df_plots, wdg, cols, sfx):
     op = wdg['adv_op' + sfx].value
     col = wdg['adv_col' + sfx].value
@@ -892,19 +1139,15 @@ def do_op(df_plots, wdg, cols, sfx):
         #groupby all columns that are not the operating column and y axis column so we can do operations on y-axis across the operating column
         groupcols = [i for i in df_plots.columns.values.tolist() if i not in [col, y_val]]
         if groupcols != []:
-            df_grouped = df_plots.groupby(groupcols, sort=False)
+            df_grouped = df_plots.groupby(groupcols, sort=False, observed=True)
         else:
-            #if we don't have other columns to group, make one, to prevent error
-            df_plots['tempgroup'] = 1
-            df_grouped = df_plots.groupby('tempgroup', sort=False)
+            #if we don't have other columns to group, group all rows together, without adding a column to df_plots
+            df_grouped = df_plots.groupby(np.ones(len(df_plots), dtype=int), sort=False)
         #Now do operations with the groups:
-        df_plots = df_grouped.apply(op_with_base, op, col, col_base, y_val).reset_index(drop=True)
-        df_plots = df_plots.replace([np.inf, -np.inf], np.nan)
-        #Finally, clean up df_plots, dropping unnecessary columns, rows with the base value, and any rows with NAs for y_vals
-        if 'tempgroup' in df_plots:
-            df_plots.drop(['tempgroup'], axis='columns', inplace=True)
-        df_plots = df_plots[~df_plots[col].isin([col_base])]
-        df_plots = df_plots[pd.notnull(df_plots[y_val])]
+        df_plots = op_with_base_grouped(df_plots, df_grouped, op, col, col_base, y_val)
+        df_plots[y_val] = df_plots[y_val].replace([np.inf, -np.inf], np.nan)
+        #Finally, clean up df_plots, dropping rows with the base value, and any rows with NAs for y_vals
+        df_plots = df_plots[~df_plots[col].isin([col_base]) & pd.notnull(df_plots[y_val])]
     return df_plots
 
 def create_figures(df_plots, wdg, cols, custom_colors):
@@ -923,23 +1166,21 @@ def create_figures(df_plots, wdg, cols, custom_colors):
     '''
     logger.info('***Building Figures...')
     plot_list = []
-    df_plots_cp = df_plots.copy()
+    #df_plots is not modified (it may be cached by set_df_plots), so it is passed to create_figure as is, and each
+    #exploded figure gets the rows of its group, in order of first appearance.
     if wdg['explode'].value == 'None':
-        plot_list.append(create_figure(df_plots_cp, df_plots, wdg, cols, custom_colors))
+        plot_list.append(create_figure(df_plots, df_plots, wdg, cols, custom_colors))
     else:
         if wdg['explode_group'].value == 'None':
-            for explode_val in df_plots_cp[wdg['explode'].value].unique().tolist():
-                df_exploded = df_plots_cp[df_plots_cp[wdg['explode'].value].isin([explode_val])].copy()
+            for explode_val, df_exploded in df_plots.groupby(wdg['explode'].value, sort=False, observed=True):
                 plot_list.append(create_figure(df_exploded, df_plots, wdg, cols, custom_colors, explode_val))
         else:
-            for explode_group in df_plots_cp[wdg['explode_group'].value].unique().tolist():
-                df_exploded_group = df_plots_cp[df_plots_cp[wdg['explode_group'].value].isin([explode_group])]
-                for explode_val in df_exploded_group[wdg['explode'].value].unique().tolist():
-                    df_exploded = df_exploded_group[df_exploded_group[wdg['explode'].value].isin([explode_val])].copy()
+            for explode_group, df_exploded_group in df_plots.groupby(wdg['explode_group'].value, sort=False, observed=True):
+                for explode_val, df_exploded in df_exploded_group.groupby(wdg['explode'].value, sort=False, observed=True):
                     plot_list.append(create_figure(df_exploded, df_plots, wdg, cols, custom_colors, explode_val, explode_group))
     set_axis_bounds(df_plots, plot_list, wdg, cols)
     if wdg['explode_grid'].value == 'Yes':
-        ncols = len(df_plots_cp[wdg['explode'].value].unique())
+        ncols = len(df_plots[wdg['explode'].value].unique())
         plot_list = [bl.gridplot(plot_list, ncols=ncols)]
     logger.info('***Done Building Figures.')
     return plot_list
@@ -999,7 +1240,7 @@ def set_axis_bounds(df, plots, wdg, cols):
             if wdg['chart_type'].value in STACKEDTYPES:
                 #sum negative values across series
                 df_neg = df[df[wdg['y'].value] < 0]
-                df_neg_sum = df_neg.groupby(groupby_cols, sort=False)[wdg['y'].value].sum().reset_index()
+                df_neg_sum = df_neg.groupby(groupby_cols, sort=False, observed=True)[wdg['y'].value].sum().reset_index()
                 min_y = df_neg_sum[wdg['y'].value].min()
             else:
                 if wdg['range'].value == 'Within Series':
@@ -1019,7 +1260,7 @@ def set_axis_bounds(df, plots, wdg, cols):
             if wdg['chart_type'].value in STACKEDTYPES:
                 #sum postive values across series
                 df_pos = df[df[wdg['y'].value] > 0]
-                df_pos_sum = df_pos.groupby(groupby_cols, sort=False)[wdg['y'].value].sum().reset_index()
+                df_pos_sum = df_pos.groupby(groupby_cols, sort=False, observed=True)[wdg['y'].value].sum().reset_index()
                 max_y = df_pos_sum[wdg['y'].value].max()
             else:
                 if wdg['range'].value == 'Within Series':
@@ -1054,7 +1295,7 @@ def create_figure(df_exploded, df_plots, wdg, cols, custom_colors, explode_val=N
     x_col = wdg['x'].value
     if wdg['x_group'].value != 'None':
         x_col = str(wdg['x_group'].value) + '_' + str(wdg['x'].value)
-        df_exploded[x_col] = df_exploded[wdg['x_group'].value].map(str) + ' ' + df_exploded[wdg['x'].value].map(str)
+        df_exploded = df_exploded.assign(**{x_col: df_exploded[wdg['x_group'].value].astype(str) + ' ' + df_exploded[wdg['x'].value].astype(str)})
 
     #Build x and y ranges and figure title
     kw = dict()
@@ -1296,7 +1537,7 @@ def create_maps(df, wdg, cols):
     breakpoints = []
     x_axis = df.iloc[:,-2]
     y_axis = df.iloc[:,-1]
-    if y_axis.dtype == object:
+    if y_axis.dtype == object or is_categorical(y_axis):
         logger.info('***Error, your y-axis is a string.')
         return (maps, breakpoints) #empty list
     if wdg['chart_type'].value == 'Area Map':
@@ -1342,7 +1583,8 @@ def create_maps(df, wdg, cols):
 
     #Ignore zeros (happens after region_boundaries have been gathered to keep regions with zero)
     if wdg['map_nozeros'].value == 'Yes':
-        df = df[y_axis != 0].copy()
+        df = df[y_axis != 0]
+        x_axis = df.iloc[:,-2]
         y_axis = df.iloc[:,-1]
 
     #set breakpoints depending on the binning strategy
@@ -1371,32 +1613,23 @@ def create_maps(df, wdg, cols):
 
     colors_full = get_map_colors(wdg, breakpoints)
 
-    df_maps = df.copy()
+    #Only x axis, y axis, and bin index are passed to create_map, so the other columns of df are not copied
+    df_maps = pd.DataFrame({x_axis.name: x_axis.values, y_axis.name: y_axis.values})
     #assign all y-values to bins
-    df_maps['bin_index'] = y_axis.apply(get_map_bin_index, args=(breakpoints,))
-    #If there are only 3 columns (x_axis, y_axis, and bin_index), that means we aren't exploding:
-    if len(df_maps.columns) == 3:
+    df_maps['bin_index'] = y_axis.apply(get_map_bin_index, args=(breakpoints,)).values
+    #If there are only 2 columns in df (x_axis and y_axis), that means we aren't exploding:
+    explode_cols = df.columns[:-2].tolist()
+    if explode_cols == []:
         maps.append(create_map(map_type, df_maps, ranges, region_boundaries, centroids, wdg, colors_full))
         logger.info('***Done building map.')
         return (maps, breakpoints) #single map
     #Otherwise we are exploding.
-    #find all unique groups of the explode columns.
-    df_unique = df_maps.copy()
-    #remove x, y, and bin_index
-    df_unique = df_unique[df_unique.columns[0:-3]]
-    df_unique.drop_duplicates(inplace=True)
-    #Loop through rows of df_unique, filter df_maps based on values in each row,
-    #and send filtered dataframe to mapping function
-    for i, row in df_unique.iterrows():
-        df_map = df_maps.copy()
-        title = ''
-        for col in df_unique:
-            df_map = df_map[df_map[col] == row[col]]
-            title = title + col + '=' + str(row[col]) + ', '
-        #preserve just x axis, y axis, and bin index
-        df_map = df_map[df_map.columns[-3:]]
-        #remove final comma of title
-        title = title[:-2]
+    #Group df_maps by the values of the explode columns, in order of first appearance,
+    #and send each group to mapping function
+    for explode_vals, df_map in df_maps.groupby([df[col].values for col in explode_cols], sort=False, observed=True):
+        if not isinstance(explode_vals, tuple):
+            explode_vals = (explode_vals,)
+        title = ', '.join(col + '=' + str(val) for col, val in zip(explode_cols, explode_vals))
         maps.append(create_map(map_type, df_map, ranges, region_boundaries, centroids, wdg, colors_full, title))
     logger.info('***Done building maps.')
     return (maps, breakpoints) #multiple maps
@@ -1712,84 +1945,101 @@ def display_config(wdg, wdg_defaults):
                 output += '<div class="config-display-item"><span class="config-display-key">' + label + ': </span>' + item_string + '</div>'
     return output
 
-def apply_aggregation(group, agg_method, y_a, y_b, y_c, wdg_range):
-    """
-    Helper function for pandas dataframe groupby object with apply function.
+def aggregate_groups(df, groupby_cols, agg_method, y_a, y_b, y_c, wdg_range):
+    '''
+    Group a dataframe and aggregate column a of each group with an aggregation method. Each aggregation method is
+    computed from groupby sums of a and of precomputed products a*b and a*c, followed by an elementwise division, and
+    within-series ranges from groupby min and max of a.
 
     Args:
-        group (pandas dataframe): This has the data required for aggregations.
-        agg_method (string): The aggregation method to apply.
+        df (pandas dataframe): Dataframe to aggregate.
+        groupby_cols (list): Columns to group by. Groups are in order of first appearance, as with sort=False.
+        agg_method (string): The aggregation method to apply, one of AGGREGATIONS (or 'sum(a*b)/sum(c)').
         y_a (string): Name of the primary (a) column for which an aggregation is calculated.
         y_b (string): Name of column used for b factor in aggregation method.
         y_c (string): Name of column used for c factor in aggregation method.
         wdg_range (string): If within-series ranges are to be added, this will be 'Within Series'.
     Returns:
-        (dataframe): The returned aggregation result, including series min and max if within-series range is to be added.
-    """
-    a = group[y_a]
-    agg_result = None
-    try:
+        df_agg (pandas dataframe): One row per group, with groupby_cols, y_a, and range_min and range_max if within-series range is to be added.
+    '''
+    a = df[y_a]
+    terms = {'a': a}
+    if agg_method in ['sum(a)/sum(b)', 'sum(a*b)/sum(b)', '[sum(a*b)/sum(b)]/[sum(a*c)/sum(c)]']:
+        terms['b'] = df[y_b]
+    if agg_method in ['sum(a*b)/sum(c)', '[sum(a*b)/sum(b)]/[sum(a*c)/sum(c)]']:
+        terms['c'] = df[y_c]
+    if agg_method in ['sum(a*b)/sum(b)', 'sum(a*b)/sum(c)', '[sum(a*b)/sum(b)]/[sum(a*c)/sum(c)]']:
+        terms['ab'] = a * df[y_b]
+    if agg_method == '[sum(a*b)/sum(b)]/[sum(a*c)/sum(c)]':
+        terms['ac'] = a * df[y_c]
+    df_grouped = pd.DataFrame(terms, index=df.index).groupby([df[c] for c in groupby_cols], sort=False, observed=True)
+    if agg_method == 'ave(a)':
+        agg_result = df_grouped['a'].mean()
+    else:
+        sums = df_grouped.sum()
         if agg_method == 'sum(a)':
-            agg_result = a.sum()
-        elif agg_method == 'ave(a)':
-            agg_result = a.mean()
+            agg_result = sums['a']
         elif agg_method == 'sum(a)/sum(b)':
-            b = group[y_b]
-            agg_result = a.sum() / b.sum()
+            agg_result = sums['a'] / sums['b']
         elif agg_method == 'sum(a*b)/sum(b)':
-            b = group[y_b]
-            agg_result = (a * b).sum() / b.sum()
+            agg_result = sums['ab'] / sums['b']
         elif agg_method == 'sum(a*b)/sum(c)':
-            b = group[y_b]
-            c = group[y_c]
-            agg_result = (a * b).sum() / c.sum()
+            agg_result = sums['ab'] / sums['c']
         elif agg_method == '[sum(a*b)/sum(b)]/[sum(a*c)/sum(c)]':
-            b = group[y_b]
-            c = group[y_c]
-            agg_result = ((a * b).sum() / b.sum())/((a * c).sum() / c.sum())
-    except ZeroDivisionError:
-        return pd.DataFrame({y_a: [None]})
+            agg_result = (sums['ab'] / sums['b']) / (sums['ac'] / sums['c'])
+        else:
+            agg_result = pd.Series([None] * len(sums), index=sums.index, dtype=object)
+    df_agg = pd.DataFrame({y_a: agg_result})
     if wdg_range == 'Within Series':
-        return pd.DataFrame({y_a: [agg_result], 'range_min': [a.min()], 'range_max': [a.max()]})
-    else:
-        return pd.DataFrame({y_a: [agg_result]})
+        df_agg['range_min'] = df_grouped['a'].min()
+        df_agg['range_max'] = df_grouped['a'].max()
+    return df_agg.reset_index()
 
-def op_with_base(group, op, col, col_base, y_val):
-    """
-    Helper function for pandas dataframe groupby object with apply function. This returns a pandas
-    dataframe with an operation applied to one of the columns.
+def op_with_base_grouped(df, df_grouped, op, col, col_base, y_val):
+    '''
+    Apply an operation to y_val of each group of a dataframe, relative to a base of the group. Consecutive bases come
+    from a groupby shift, Total bases from a groupby sum, and other bases from the rows of the base value, looked up
+    by group number. Rows keep their order, and rows with missing group keys are dropped.
 
     Args:
-        group (pandas dataframe): This has columns required for performing the operation
+        df (pandas dataframe): Dataframe that is grouped.
+        df_grouped (pandas groupby): df grouped by all columns other than col and y_val, with sort=False.
         op (string): The type of operation: 'Difference', 'Ratio'
         col (string): The column across which the operation is happening
         col_base (string): The value of col to be used as the base for the operation, or "Consecutive" or "Total"
         y_val (string): Name of column that will be modified according to the operation.
     Returns:
-        group_out (pandas dataframe): A like-indexed dataframe with the specified operations.
-    """
-    group_out = group.copy()
+        df_out (pandas dataframe): df with the operation applied to y_val, with a new index.
+    '''
+    y = df[y_val]
+    group_nums = df_grouped.ngroup()
+    in_group = group_nums.notna() & (group_nums >= 0)
     if col_base == 'Consecutive':
-        if op == 'Difference':
-            group_out[y_val] = group[y_val] - group[y_val].shift()
-        elif op == 'Ratio':
-            group_out[y_val] = group[y_val] / group[y_val].shift()
+        y_base = df_grouped[y_val].shift()
     elif col_base == 'Total':
-        if op == 'Difference':
-            group_out[y_val] = group[y_val] - group[y_val].sum()
-        elif op == 'Ratio':
-            group_out[y_val] = group[y_val] / group[y_val].sum()
+        y_base = df_grouped[y_val].transform('sum')
     else:
-        df_base = group[group[col]==col_base]
-        if df_base.empty:
-            y_base = 0
-        else:
-            y_base = df_base[y_val].iloc[0]
-        if op == 'Difference':
-            group_out[y_val] = group[y_val] - y_base
-        elif op == 'Ratio':
-            group_out[y_val] = group[y_val] / y_base if y_base else 0
-    return group_out
+        #Each group has at most one row of the base value after aggregation. Groups without it have a base of 0.
+        is_base = in_group & (df[col] == col_base)
+        base_values = pd.Series(y[is_base].values, index=group_nums[is_base].values)
+        base_values = base_values[~base_values.index.duplicated()]
+        y_base = group_nums.map(base_values).where(group_nums.isin(base_values.index), 0)
+    if op == 'Difference':
+        y_out = y - y_base
+    elif op == 'Ratio':
+        y_out = y / y_base
+        if col_base not in ADV_BASES and not is_base.any():
+            #Groups without the base value get an integer 0, so y_val stays integer when no group has it
+            y_out = pd.Series(0, index=y.index)
+        elif col_base not in ADV_BASES:
+            y_out = y_out.where(y_base != 0, 0)
+    else:
+        y_out = y
+    keep = np.flatnonzero(in_group.values)
+    df_out = df.take(keep)
+    df_out.index = pd.RangeIndex(len(df_out))
+    df_out[y_val] = y_out.values[keep]
+    return df_out
 
 def prettify_numbers(number_list):
     str_list = []
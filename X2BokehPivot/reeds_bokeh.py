@@ -8,14 +8,20 @@ DEFAULT_DATA_TYPE = 'ReEDS 2.0'
 
 import os
 import copy
+import glob
+import hashlib
+import numpy as np
 import pandas as pd
 import collections
 import bokeh.models.widgets as bmw
 import sys
+import tempfile
 import reeds2 as rd2
 import core
 import datetime
 import subprocess as sp
+import threading
+import concurrent.futures
 if sys.version_info[0] == 2:
     import gdx2py
 import logging
@@ -36,6 +42,43 @@ DEFAULT_END_YEAR = 2050
 GL_REEDS = {'scenarios': [], 'result_dfs': {}}
 GLRD = {}
 GLDT = ''
+
+#Extensions of typed output files that get_src reads in place of csv files of the same name
+NATIVE_OUTPUT_FORMATS = ['.parquet', '.feather']
+
+#Process-wide LRU cache of cleaned source dataframes from get_src. Keys are (path, mtime, size, read options),
+#so a source file is parsed again only once it changes. Values are (dataframe, bytes) tuples, and least recently
+#used entries are dropped once the cache exceeds SRC_CACHE_MAX_MB.
+SRC_CACHE_MAX_MB = 2048
+SRC_CACHE = {'dfs': collections.OrderedDict(), 'bytes': 0, 'hits': 0, 'misses': 0}
+SRC_CACHE_LOCK = threading.Lock()
+
+#Number of threads loading scenarios of a result at the same time in get_reeds_data
+SCENARIO_LOAD_WORKERS = min(8, os.cpu_count() or 1)
+
+#Folder, inside the output folder of each scenario, of the Parquet copies of cleaned csv and gdx sources saved by
+#get_src, so that new bokeh sessions and report subprocesses don't parse the sources again. See warm_src_cache.
+SRC_DISK_CACHE_SUBDIR = '.bokehpivot_cache'
+#Version of the cleaning done by read_src, part of the fingerprint of the on-disk cache files
+SRC_DISK_CACHE_VERSION = 3
+
+#Special values of GAMS outputs that get_src reads as 0
+SRC_ZERO_VALUES = ['Eps', 'Undf']
+
+#Preprocess functions of results_meta that only drop columns and sum over the others, and the keyword arguments of
+#each that add group columns. A chain of them at the start of a single-source result is pushed down into get_src,
+#which then reads only the columns they keep and sums them during the read. See get_src_pushdown.
+SUM_PREPROCESS_GROUP_KEYS = {
+    'sum_over_cols': [],
+    'sum_over_months': ['month_col'],
+    'sum_over_days': ['year_col', 'month_col', 'day_col'],
+    'sum_over_hours': ['year_col', 'month_col', 'day_col', 'hour_col'],
+}
+
+#csv sources larger than SRC_CHUNKED_MIN_MB with sums pushed down are read in chunks of SRC_CHUNK_ROWS rows, each
+#summed as it is read, so results at a lower time resolution can be built from files larger than memory.
+SRC_CHUNKED_MIN_MB = 256
+SRC_CHUNK_ROWS = 2000000
 reeds = None
 
 def reeds_static(data_type, data_source, scenario_filter, diff, base, static_presets, report_path, report_format, html_num, output_dir, auto_open):
@@ -192,7 +235,7 @@ def get_wdg_reeds(path, init_load, wdg_config, wdg_defaults, custom_sorts, custo
             for i_scen, scen in df_scen.iterrows():
                 if os.path.isdir(scen['path']):
                     abs_path_scen = os.path.abspath(scen['path'])
-                    if os.path.isfile(abs_path_scen + GLRD['output_subdir'] + GLRD['test_file']):
+                    if output_exists(abs_path_scen + GLRD['output_subdir'] + GLRD['test_file']):
                         custom_sorts['scenario'].append(scen['name'])
                         scenarios.append({'name': scen['name'], 'path': abs_path_scen})
                         if 'color' in df_scen:
@@ -202,12 +245,12 @@ def get_wdg_reeds(path, init_load, wdg_config, wdg_defaults, custom_sorts, custo
         #run folders, so gather all of those scenarios.
         elif os.path.isdir(runs_path):
             abs_path = str(os.path.abspath(runs_path))
-            if os.path.isfile(abs_path + GLRD['output_subdir'] + GLRD['test_file']):
+            if output_exists(abs_path + GLRD['output_subdir'] + GLRD['test_file']):
                 scenarios.append({'name': os.path.basename(abs_path), 'path': abs_path})
             else:
                 subdirs = next(os.walk(abs_path))[1]
                 for subdir in subdirs:
-                    if os.path.isfile(abs_path+'/'+subdir + GLRD['output_subdir'] + GLRD['test_file']):
+                    if output_exists(abs_path+'/'+subdir + GLRD['output_subdir'] + GLRD['test_file']):
                         abs_subdir = str(os.path.abspath(abs_path+'/'+subdir))
                         scenarios.append({'name': subdir, 'path': abs_subdir})
     #If we have scenarios, build widgets for scenario filters and result.
@@ -287,38 +330,18 @@ def get_reeds_data(topwdg, scenarios, result_dfs):
         active_scenarios = [scenarios[i]['name'] for i in topwdg['scenario_filter'].active]
         result_dfs[result] = result_dfs[result][result_dfs[result]['scenario'].isin(active_scenarios)]
 
-    #For each selected scenario, retrieve the data from gdx if we don't already have it,
-    #and update result_dfs with the new data.
+    #For each selected scenario, retrieve the data from gdx if we don't already have it. New scenarios are
+    #loaded in a pool of threads and added to result_dfs with a single concat.
     result_meta = reeds.results_meta[result]
-    for i in topwdg['scenario_filter'].active:
-        scenario_name = scenarios[i]['name']
-        if scenario_name not in cur_scenarios:
-            #get the gdx result and preprocess
-            if 'sources' in result_meta:
-                #If we have multiple parameters as data sources, we must gather them all, and the first preprocess
-                #function (which is necessary) will accept a dict of dataframes and return a combined dataframe.
-                df_scen_result = {}
-                for src in result_meta['sources']:
-                    df_scen_result[src['name']] = get_src(scenarios[i], src)
-            else:
-                #else we have only one parameter as a data source
-                df_scen_result = get_src(scenarios[i], result_meta)
-            #preprocess and return one dataframe
-            if 'preprocess' in result_meta:
-                for preprocess in result_meta['preprocess']:
-                    df_scen_result = preprocess['func'](df_scen_result, **preprocess['args'])
-            #preprocess columns in this dataframe
-            for col in df_scen_result.columns.values.tolist():
-                if col in reeds.columns_meta and 'preprocess' in reeds.columns_meta[col]:
-                    for preprocess in reeds.columns_meta[col]['preprocess']:
-                        df_scen_result[col] = preprocess(df_scen_result[col])
-            df_scen_result['scenario'] = scenario_name
-            if result_dfs[result] is None:
-                result_dfs[result] = df_scen_result
-            else:
-                result_dfs[result] = pd.concat([result_dfs[result], df_scen_result]).reset_index(drop=True)
-        logger.info('***Done fetching ' + str(result) + ' for ' + str(scenario_name) + '.')
-
+    new_scenarios = [scenarios[i] for i in topwdg['scenario_filter'].active if scenarios[i]['name'] not in cur_scenarios]
+    if new_scenarios:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(SCENARIO_LOAD_WORKERS, len(new_scenarios))) as executor:
+            new_dfs = list(executor.map(lambda scen: get_reeds_scenario(scen, result_meta), new_scenarios))
+        if result_dfs[result] is not None:
+            new_dfs = [result_dfs[result]] + new_dfs
+        result_dfs[result] = pd.concat(new_dfs).reset_index(drop=True)
+
+    logger.info('***Source cache: ' + src_cache_stats())
     #fill missing values with 0:
     df = result_dfs[result]
     if 'index' in result_meta:
@@ -328,43 +351,405 @@ def get_reeds_data(topwdg, scenarios, result_dfs):
         result_dfs[result] = df.set_index(idx_cols).reindex(full_idx).reset_index()
     logger.info('***Done fetching ' + str(result) + ': ' + str(datetime.datetime.now() - startTime))
 
+def get_reeds_scenario(scen, result_meta):
+    '''
+    Fetch the sources of a ReEDS result for one scenario and apply the result and column preprocess functions.
+
+    Args:
+        scen (dict): Scenario dictionary. Keys are 'name' and 'path'.
+        result_meta (dict): Entry of reeds.results_meta for the result.
+
+    Returns:
+        df_scen_result (pandas dataframe): The result for the scenario, with a 'scenario' column.
+    '''
+    startTime = datetime.datetime.now()
+    #get the gdx result and preprocess
+    if 'sources' in result_meta:
+        #If we have multiple parameters as data sources, we must gather them all, and the first preprocess
+        #function (which is necessary) will accept a dict of dataframes and return a combined dataframe.
+        df_scen_result = {}
+        for src in result_meta['sources']:
+            df_scen_result[src['name']] = get_src(scen, src)
+        pushed = 0
+    else:
+        #else we have only one parameter as a data source, read with the leading sum preprocess functions pushed down
+        src, pushed = get_src_pushdown(result_meta)
+        df_scen_result = get_src(scen, src)
+    #preprocess and return one dataframe
+    if 'preprocess' in result_meta:
+        for preprocess in result_meta['preprocess'][pushed:]:
+            df_scen_result = preprocess['func'](df_scen_result, **preprocess['args'])
+    #preprocess columns in this dataframe
+    for col in df_scen_result.columns.values.tolist():
+        if col in reeds.columns_meta and 'preprocess' in reeds.columns_meta[col]:
+            for preprocess in reeds.columns_meta[col]['preprocess']:
+                df_scen_result[col] = preprocess(df_scen_result[col])
+    df_scen_result['scenario'] = scen['name']
+    logger.info('***Done fetching for ' + str(scen['name']) + ': ' + str(datetime.datetime.now() - startTime))
+    return df_scen_result
+
 def get_src(scen, src):
     '''
     For a given scenario and data source, fetch gdx or csv data and do common
-    pre-processing (remove Eps, coerce numeric columns to numeric, and lowercase everything)
+    pre-processing (remove Eps, coerce numeric columns to numeric, and lowercase everything).
+    Cleaned sources are kept in the process-wide SRC_CACHE until their file changes.
 
     Args:
         scen (dict): Scenario dictionary. Keys are 'name' and 'path'.
-        src (dict): Source Dictionary. Keys are 'file', 'param' (for gdx sources), and 'columns' (optional for csv sources)
+        src (dict): Source Dictionary. Keys are 'file', 'param' (for gdx sources), and 'columns' (optional for csv sources),
+            and optionally 'usecols' and 'sums' from get_src_pushdown.
 
     Returns:
-        df_src (pandas dataframe): A dataframe of the source
+        df_src (pandas dataframe): A dataframe of the source, which the caller may modify
     '''
     filepath = scen['path'] + GLRD['output_subdir'] + src['file']
+    native_path = get_native_path(filepath)
+    stat = os.stat(filepath if native_path is None else native_path)
+    read_options = tuple((k, repr(src[k])) for k in ['param', 'header', 'transpose', 'columns', 'usecols', 'sums'] if k in src)
+    key = (os.path.abspath(filepath if native_path is None else native_path), stat.st_mtime_ns, stat.st_size, read_options)
+    dfs = SRC_CACHE['dfs']
+    with SRC_CACHE_LOCK:
+        if key in dfs:
+            SRC_CACHE['hits'] += 1
+            dfs.move_to_end(key)
+            return dfs[key][0].copy()
+        SRC_CACHE['misses'] += 1
+        #Drop entries of earlier versions of the file
+        for old_key in [k for k in dfs if k[0] == key[0] and k[3] == key[3]]:
+            SRC_CACHE['bytes'] -= dfs.pop(old_key)[1]
+    if native_path is None:
+        #Typed Parquet/Feather outputs are read directly, csv and gdx sources go through the on-disk cache
+        cache_path = get_src_cache_path(filepath, key)
+        df_src = read_src_cache(cache_path)
+        if df_src is None:
+            df_src = read_src(filepath, native_path, src)
+            write_src_cache(df_src, cache_path)
+    else:
+        df_src = read_src(filepath, native_path, src)
+    nbytes = df_src.memory_usage(index=True, deep=True).sum()
+    if nbytes <= SRC_CACHE_MAX_MB * 1024**2:
+        with SRC_CACHE_LOCK:
+            if key not in dfs:
+                dfs[key] = (df_src.copy(), nbytes)
+                SRC_CACHE['bytes'] += nbytes
+            while SRC_CACHE['bytes'] > SRC_CACHE_MAX_MB * 1024**2:
+                SRC_CACHE['bytes'] -= dfs.popitem(last=False)[1][1]
+    return df_src
+
+def get_src_pushdown(result_meta):
+    '''
+    Push the sum preprocess functions (SUM_PREPROCESS_GROUP_KEYS) at the start of the preprocess chain of a
+    single-source result down into its source. The first of them gives the columns the result needs, so the
+    source is read with only these columns, and the whole chain is applied by get_src right after the read.
+    Sums are applied after cleaning, as lowercasing can merge groups.
+
+    Args:
+        result_meta (dict): Entry of reeds.results_meta for a result without 'sources'.
+
+    Returns:
+        src (dict): Source Dictionary for get_src, with 'usecols' and 'sums' added if anything was pushed down.
+        pushed (int): Number of preprocess functions of result_meta applied by get_src.
+    '''
+    src = {k: v for k, v in result_meta.items() if k in ['file', 'param', 'header', 'transpose', 'columns']}
+    columns = src.get('columns')
+    if columns is None or src.get('transpose') == True or not src['file'].endswith('.csv'):
+        return (src, 0)
+    sums = []
+    for preprocess in result_meta.get('preprocess', []):
+        name = getattr(preprocess['func'], '__name__', None)
+        if name not in SUM_PREPROCESS_GROUP_KEYS or getattr(reeds, name, None) is not preprocess['func']:
+            break
+        sums.append({'func': name, 'args': preprocess['args']})
+    if not sums:
+        return (src, 0)
+    args = sums[0]['args']
+    group_cols = args['group_cols'] + [args[k] for k in SUM_PREPROCESS_GROUP_KEYS[sums[0]['func']] if k in args]
+    if 'val_cols' in args:
+        usecols = [c for c in columns if c in group_cols + args['val_cols']]
+    elif 'drop_cols' in args:
+        usecols = [c for c in columns if c not in args['drop_cols']]
+    else:
+        usecols = columns
+    if not set(group_cols) <= set(usecols):
+        return (src, 0)
+    if usecols != columns:
+        src['usecols'] = usecols
+    src['sums'] = sums
+    return (src, len(sums))
+
+def src_cache_stats():
+    '''
+    Summary of the hits, misses and size of the source cache of get_src, for the log.
+    '''
+    lookups = SRC_CACHE['hits'] + SRC_CACHE['misses']
+    hit_rate = 100 * SRC_CACHE['hits'] / lookups if lookups else 0
+    return (str(SRC_CACHE['hits']) + ' hits, ' + str(SRC_CACHE['misses']) + ' misses (' + '{:.0f}'.format(hit_rate) + '% hit rate), ' +
+        str(len(SRC_CACHE['dfs'])) + ' sources in ' + '{:.1f}'.format(SRC_CACHE['bytes'] / 1024**2) + ' of ' + str(SRC_CACHE_MAX_MB) + ' MB')
+
+def get_src_cache_path(filepath, key):
+    '''
+    Path of the on-disk cache file of a source. The file name holds a fingerprint of the read options of the source,
+    so that each way of reading it (e.g. with different columns pushed down) has its own cache file, followed by a
+    fingerprint of its modification time and size, so a cache file is only found while it matches the source.
+
+    Args:
+        filepath (string): Path to the gdx or csv file of the source.
+        key (tuple): get_src cache key, (path, mtime, size, read options).
+
+    Returns:
+        cache_path (string): Path to the Parquet cache file.
+    '''
+    options = hashlib.sha1(repr(key[3]).encode()).hexdigest()[:8]
+    fingerprint = hashlib.sha1(repr((SRC_DISK_CACHE_VERSION,) + key[1:]).encode()).hexdigest()[:16]
+    return os.path.join(os.path.dirname(filepath), SRC_DISK_CACHE_SUBDIR, os.path.basename(filepath) + '.' + options + '.' + fingerprint + '.parquet')
+
+def read_src_cache(cache_path):
+    '''
+    Read a cleaned source from the on-disk cache, or return None if it is not cached or cannot be read.
+    '''
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        return pd.read_parquet(cache_path)
+    except Exception as e:
+        logger.info('***Could not read cached source ' + cache_path + ': ' + str(e))
+        return None
+
+def write_src_cache(df_src, cache_path):
+    '''
+    Save a cleaned source to the on-disk cache, replacing cache files of earlier versions of the source read with
+    the same options.
+    Sources that Parquet can't store (e.g. columns of mixed types or non-string column names) and read-only
+    output folders are not cached.
+    '''
+    if not all(isinstance(col, str) for col in df_src.columns):
+        return
+    cache_dir, cache_name = os.path.split(cache_path)
+    src_name = cache_name.rsplit('.', 2)[0]
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for old_path in glob.glob(os.path.join(glob.escape(cache_dir), glob.escape(src_name) + '.*.parquet')):
+            if old_path != cache_path:
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+        #Each writer has its own temporary file, as sessions and warm_cache.py may write the same source at once
+        tmp_fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=cache_name + '.', suffix='.tmp')
+        os.close(tmp_fd)
+        df_src.to_parquet(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.info('***Could not cache source ' + cache_path + ': ' + str(e))
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def warm_src_cache(path, data_type=DEFAULT_DATA_TYPE):
+    '''
+    Build the on-disk cache of get_src for the sources of every result of every scenario found under a folder.
+
+    Args:
+        path (string): Path to a folder of ReEDS run folders, searched recursively.
+        data_type (string): One of DATA_TYPE_OPTIONS.
+
+    Returns:
+        cached (int): Number of sources read and cached.
+    '''
+    logger.info('***Warming source cache for ' + path + '...')
+    startTime = datetime.datetime.now()
+    set_globs_by_type(data_type)
+    srcs = []
+    for result_meta in reeds.results_meta.values():
+        for src in result_meta.get('sources', [get_src_pushdown(result_meta)[0]] if 'file' in result_meta else []):
+            if 'file' in src and src not in srcs:
+                srcs.append(src)
+    cached = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames[:] = [d for d in dirnames if d != SRC_DISK_CACHE_SUBDIR]
+        if not output_exists(dirpath + GLRD['output_subdir'] + GLRD['test_file']):
+            continue
+        scen = {'name': os.path.basename(dirpath), 'path': os.path.abspath(dirpath)}
+        for src in srcs:
+            filepath = scen['path'] + GLRD['output_subdir'] + src['file']
+            if os.path.isfile(filepath):
+                try:
+                    get_src(scen, src)
+                    cached += 1
+                except Exception as e:
+                    logger.info('***Could not read ' + filepath + ': ' + str(e))
+        logger.info('***Done warming source cache for ' + scen['name'] + '.')
+    logger.info('***Done warming source cache: ' + str(cached) + ' sources in ' + str(datetime.datetime.now() - startTime))
+    return cached
+
+def read_src(filepath, native_path, src):
+    '''
+    Read and clean a data source for get_src.
+
+    Args:
+        filepath (string): Path to the gdx or csv file of the source.
+        native_path (string): Path to a Parquet or Feather file stored in place of the csv file, or None.
+        src (dict): Source Dictionary, as in get_src.
+
+    Returns:
+        df_src (pandas dataframe): A dataframe of the source
+    '''
+    if native_path is not None:
+        #Typed Parquet/Feather output stored in place of the csv: no csv parsing or numeric coercion needed
+        read_columns = None
+        if 'usecols' in src:
+            #Columns are renamed by position, so find the names in the file of the columns to read
+            file_columns = get_native_columns(native_path)
+            if len(file_columns) == len(src['columns']):
+                read_columns = [c for c, name in zip(file_columns, src['columns']) if name in src['usecols']]
+        if native_path.endswith('.parquet'):
+            df_src = pd.read_parquet(native_path, columns=read_columns)
+        else:
+            df_src = pd.read_feather(native_path, columns=read_columns)
+        if 'columns' in src:
+            df_src.columns = src['usecols'] if read_columns is not None else src['columns']
+            if 'usecols' in src and read_columns is None:
+                df_src = df_src[src['usecols']]
+        for col in df_src.select_dtypes('category'):
+            df_src[col] = df_src[col].astype(object)
+        return sum_src(df_to_lowercase(df_src), src)
     if src['file'].endswith('.gdx'):
         data = gdx2py.par2list(filepath, src['param'])
         df_src = pd.DataFrame(data)
         df_src.columns = src['columns']
     elif src['file'].endswith('.csv'):
-        if 'header' in src and src['header'] == None:
-            df_src = pd.read_csv(filepath, low_memory=False, header=None)
-        else:
-            df_src = pd.read_csv(filepath, low_memory=False)
+        header = None if 'header' in src and src['header'] == None else 'infer'
         if 'transpose' in src and src['transpose'] == True:
-            df_src = df_src.T
-        if 'columns' in src:
-            df_src.columns = src['columns']
-    df_src.replace('Eps',0, inplace=True)
-    df_src.replace('Undf',0, inplace=True)
-    df_src = df_src.apply(pd.to_numeric, errors='ignore')
-    df_src = df_to_lowercase(df_src)
+            df_src = pd.read_csv(filepath, low_memory=False, header=header).T
+            if 'columns' in src:
+                df_src.columns = src['columns']
+        else:
+            if 'sums' in src and os.path.getsize(filepath) > SRC_CHUNKED_MIN_MB * 1024**2:
+                df_src = read_src_chunked(filepath, src, header)
+                if df_src is not None:
+                    return df_src
+            df_src = parse_csv_src(filepath, src, header)
+    return sum_src(clean_src(df_src), src)
+
+def parse_csv_src(filepath, src, header, chunksize=None):
+    '''
+    Parse a csv source for read_src, with columns of string type in columns_meta parsed straight to categoricals.
+    Eps and Undf are left to clean_src, and empty cells stay missing until process_reeds_data fills them, so that
+    preprocess functions see them as before.
+
+    The columns of src are given to pd.read_csv as names only if the file has as many columns. Otherwise pandas
+    would silently turn the leading columns into the index, so the file is read with its own header instead, and
+    assigning the columns of src raises as it did before.
+
+    Args:
+        filepath (string): Path to the csv file.
+        src (dict): Source Dictionary, as in get_src.
+        header (None or string): header argument of pd.read_csv.
+        chunksize (int, optional): Parse the file in chunks of this many rows.
+
+    Returns:
+        df_src (pandas dataframe or iterator): A dataframe of the source, or an iterator of dataframes of chunksize rows.
+    '''
+    names = src.get('columns')
+    if names is not None and len(pd.read_csv(filepath, header=None, nrows=1).columns) != len(names):
+        reader = pd.read_csv(filepath, low_memory=False, header=header, chunksize=chunksize)
+        if chunksize is None:
+            reader.columns = names
+            return reader
+        return (chunk.set_axis(names, axis=1) for chunk in reader)
+    dtype = {c: 'category' for c in names or [] if c in reeds.columns_meta and reeds.columns_meta[c].get('type') == 'string'}
+    return pd.read_csv(filepath, low_memory=False, header=0 if names is not None and header == 'infer' else header, names=names,
+        usecols=src.get('usecols'), dtype=dtype, chunksize=chunksize)
+
+def read_src_chunked(filepath, src, header):
+    '''
+    Read a csv source with sums pushed down (see get_src_pushdown) in chunks of SRC_CHUNK_ROWS rows. Each chunk is
+    cleaned and summed by the first of the sums as soon as it is parsed, and the partial sums of all chunks are
+    summed once more with the rest of the sums at the end, so only one chunk and the partial sums are in memory
+    at a time.
+
+    Args:
+        filepath (string): Path to the csv file.
+        src (dict): Source Dictionary, as in get_src, with 'sums'.
+        header (None or string): header argument of pd.read_csv.
+
+    Returns:
+        df_src (pandas dataframe): The cleaned and summed source, or None if cleaning gave a column strings in some
+            chunks and numbers in others (e.g. region names that are numbers in the first rows). The source must
+            then be read at once to be cleaned consistently.
+    '''
+    logger.info('***Reading ' + filepath + ' in chunks...')
+    startTime = datetime.datetime.now()
+    first = src['sums'][0]
+    partials = []
+    for chunk in parse_csv_src(filepath, src, header, chunksize=SRC_CHUNK_ROWS):
+        partials.append(getattr(reeds, first['func'])(clean_src(chunk), **first['args']))
+    df_src = pd.concat(partials, ignore_index=True)
+    del partials
+    for col in df_src:
+        if df_src[col].dtype == object and pd.api.types.infer_dtype(df_src[col], skipna=True) not in ['string', 'empty']:
+            logger.info('***Column ' + str(col) + ' of ' + filepath + ' has mixed types across chunks, reading it at once.')
+            return None
+    #Summing the partial sums again combines groups found in several chunks
+    df_src = sum_src(df_src, src)
+    logger.info('***Done reading ' + filepath + ' in chunks: ' + str(datetime.datetime.now() - startTime))
+    return df_src
+
+def sum_src(df_src, src):
+    '''
+    Apply the sum preprocess functions pushed down into a source by get_src_pushdown to the cleaned source.
+    '''
+    for preprocess in src.get('sums', []):
+        df_src = getattr(reeds, preprocess['func'])(df_src, **preprocess['args'])
     return df_src
 
+def get_native_columns(native_path):
+    '''
+    Return the column names of a Parquet or Feather file without reading its data.
+    '''
+    import pyarrow as pa
+    if native_path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_schema(native_path).names
+    with pa.memory_map(native_path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+def clean_src(df_src):
+    '''
+    Replace 'Eps' and 'Undf' by 0, convert columns of numbers to numeric, and lowercase the other string columns.
+    Only object and categorical columns need cleaning, and each of them is cleaned on its unique values, which are
+    then expanded back to the rows. String columns are returned as object columns.
+
+    Args:
+        df_src (pandas dataframe): A dataframe of a source as read from a csv or gdx file.
+
+    Returns:
+        df_src (pandas dataframe): The cleaned dataframe, modified in place.
+    '''
+    for col in df_src:
+        if df_src[col].dtype != object and not isinstance(df_src[col].dtype, pd.CategoricalDtype):
+            continue
+        cat = df_src[col].astype('category')
+        codes = cat.cat.codes.values
+        categories = cat.cat.categories
+        is_eps = np.asarray(categories.isin(SRC_ZERO_VALUES))
+        numeric = pd.to_numeric(pd.Series(np.where(is_eps, 0, categories.values.astype(object))), errors='coerce')
+        if numeric.notna().all():
+            values = numeric.values
+        else:
+            #Strings are lowercased once per category. Like str.lower, non-string values become NaN.
+            values = np.array([v.lower() if isinstance(v, str) else np.nan for v in categories], dtype=object)
+            values[is_eps] = np.nan
+        if (codes < 0).any():
+            #Code -1 (missing) picks the trailing NaN
+            values = np.append(values.astype(float) if values.dtype != object else values, np.nan)
+        df_src[col] = values[codes]
+    return df_src
 
 def process_reeds_data(topwdg, custom_sorts, custom_colors, result_dfs):
     '''
     Apply joins, mappings, ordering data to a selected result dataframe.
-    Also categorize the columns of the dataframe and fill NA values.
+    Also categorize the columns of the dataframe, fill NA values, and convert discrete columns to pandas categoricals.
 
     Args:
         topwdg (ordered dict): ReEDS widgets (meta widgets, scenarios widget, result widget)
@@ -443,6 +828,8 @@ def process_reeds_data(topwdg, custom_sorts, custom_colors, result_dfs):
     #fill NA depending on column type
     df[cols['discrete']] = df[cols['discrete']].fillna('{BLANK}')
     df[cols['continuous']] = df[cols['continuous']].fillna(0)
+    #store discrete columns as categoricals, in the order of their custom sorts
+    core.categorize_discrete(df, cols['discrete'], custom_sorts)
     logger.info('***Done with joins, maps, ordering: ' + str(datetime.datetime.now() - startTime))
     return (df, cols)
 
@@ -588,6 +975,30 @@ def update_reeds_presets(attr, old, new):
     preset = reeds.results_meta[wdg['result'].value]['presets'][wdg['presets'].value]
     core.preset_wdg(preset)
 
+def get_native_path(filepath):
+    '''
+    Find a Parquet or Feather file stored in place of a missing csv output file.
+
+    Args:
+        filepath (string): Path to the csv output file.
+
+    Returns:
+        native_path (string): Path to the Parquet or Feather file, or None if the csv exists or there is no such file.
+    '''
+    if not filepath.endswith('.csv') or os.path.isfile(filepath):
+        return None
+    for ext in NATIVE_OUTPUT_FORMATS:
+        native_path = filepath[:-len('.csv')] + ext
+        if os.path.isfile(native_path):
+            return native_path
+    return None
+
+def output_exists(filepath):
+    '''
+    Check if an output file exists, either as is or as a Parquet or Feather file in place of a csv.
+    '''
+    return os.path.isfile(filepath) or get_native_path(filepath) is not None
+
 def df_to_lowercase(df):
     for col in df:
         if df[col].dtype == object:
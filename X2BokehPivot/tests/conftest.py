@@ -0,0 +1,14 @@
+import os
+import sys
+
+# The bokehpivot modules import each other as top-level modules
+BOKEHPIVOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BOKEHPIVOT_DIR not in sys.path:
+    sys.path.insert(0, BOKEHPIVOT_DIR)
+
+# The bokehpivot modules need the packages of environment.yaml. Without them (e.g. when running the tests of the
+# extraction scripts from the repository root), the tests of this folder are not collected.
+try:
+    import core
+except Exception:
+    collect_ignore_glob = ['test_*.py']
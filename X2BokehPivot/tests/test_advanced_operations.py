@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import core
+
+
+def op_with_base(group, op, col, col_base, y_val):
+    """
+    Helper function for pandas dataframe groupby object with apply function, as do_op applied operations before
+    op_with_base_grouped. This returns a pandas dataframe with an operation applied to one of the columns.
+
+    Args:
+        group (pandas dataframe): This has columns required for performing the operation
+        op (string): The type of operation: 'Difference', 'Ratio'
+        col (string): The column across which the operation is happening
+        col_base (string): The value of col to be used as the base for the operation, or "Consecutive" or "Total"
+        y_val (string): Name of column that will be modified according to the operation.
+    Returns:
+        group_out (pandas dataframe): A like-indexed dataframe with the specified operations.
+    """
+    group_out = group.copy()
+    if col_base == 'Consecutive':
+        if op == 'Difference':
+            group_out[y_val] = group[y_val] - group[y_val].shift()
+        elif op == 'Ratio':
+            group_out[y_val] = group[y_val] / group[y_val].shift()
+    elif col_base == 'Total':
+        if op == 'Difference':
+            group_out[y_val] = group[y_val] - group[y_val].sum()
+        elif op == 'Ratio':
+            group_out[y_val] = group[y_val] / group[y_val].sum()
+    else:
+        df_base = group[group[col]==col_base]
+        if df_base.empty:
+            y_base = 0
+        else:
+            y_base = df_base[y_val].iloc[0]
+        if op == 'Difference':
+            group_out[y_val] = group[y_val] - y_base
+        elif op == 'Ratio':
+            group_out[y_val] = group[y_val] / y_base if y_base else 0
+    return group_out
+
+
+def apply_op_with_base(df, groupcols, op, col, col_base, y_val):
+    '''
+    Group df and apply op_with_base to each group, with the result of groupby apply under pandas 1.3.5 of
+    environment.yaml: the like-indexed results of the groups are put back in the order of the rows of df, without
+    the rows with missing group keys.
+    '''
+    df_out = pd.concat([op_with_base(group, op, col, col_base, y_val) for _, group in df.groupby(groupcols, sort=False)])
+    return df_out.loc[df.index[df.index.isin(df_out.index)]].reset_index(drop=True)
+
+
+def make_plots(n_rows=2000):
+    '''
+    Build a synthetic aggregated dataframe, in no particular group order, with a missing group key, groups without
+    some scenarios, and zero values.
+    '''
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'tech': rng.choice(['wind', 'solar', 'gas', 'coal'], n_rows).astype(object),
+        'year': rng.choice([2020, 2030, 2040, 2050], n_rows),
+        'scenario': rng.choice(['base', 'low', 'high'], n_rows),
+        'value': rng.integers(0, 5, n_rows).astype(float),
+    })
+    df = df.drop_duplicates(['tech', 'year', 'scenario']).reset_index(drop=True)
+    df.loc[3, 'tech'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('op', ['Difference', 'Ratio'])
+@pytest.mark.parametrize('col, col_base', [('scenario', 'base'), ('scenario', 'missing'), ('scenario', 'Consecutive'),
+    ('scenario', 'Total'), ('year', 2030.0), ('year', 'Consecutive')])
+def test_op_with_base_grouped_matches_apply(op, col, col_base):
+    df = make_plots()
+    groupcols = [c for c in df.columns if c not in [col, 'value']]
+    df_grouped = df.groupby(groupcols, sort=False, observed=True)
+    df_out = core.op_with_base_grouped(df, df_grouped, op, col, col_base, 'value')
+    pd.testing.assert_frame_equal(df_out, apply_op_with_base(df, groupcols, op, col, col_base, 'value'))
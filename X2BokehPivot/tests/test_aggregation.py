@@ -0,0 +1,84 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import core
+
+
+def apply_aggregation(group, agg_method, y_a, y_b, y_c, wdg_range):
+    """
+    Helper function for pandas dataframe groupby object with apply function, as core aggregated groups before
+    aggregate_groups. Reference implementation that aggregate_groups must match.
+
+    Args:
+        group (pandas dataframe): This has the data required for aggregations.
+        agg_method (string): The aggregation method to apply.
+        y_a (string): Name of the primary (a) column for which an aggregation is calculated.
+        y_b (string): Name of column used for b factor in aggregation method.
+        y_c (string): Name of column used for c factor in aggregation method.
+        wdg_range (string): If within-series ranges are to be added, this will be 'Within Series'.
+    Returns:
+        (dataframe): The returned aggregation result, including series min and max if within-series range is to be added.
+    """
+    a = group[y_a]
+    agg_result = None
+    try:
+        if agg_method == 'sum(a)':
+            agg_result = a.sum()
+        elif agg_method == 'ave(a)':
+            agg_result = a.mean()
+        elif agg_method == 'sum(a)/sum(b)':
+            b = group[y_b]
+            agg_result = a.sum() / b.sum()
+        elif agg_method == 'sum(a*b)/sum(b)':
+            b = group[y_b]
+            agg_result = (a * b).sum() / b.sum()
+        elif agg_method == 'sum(a*b)/sum(c)':
+            b = group[y_b]
+            c = group[y_c]
+            agg_result = (a * b).sum() / c.sum()
+        elif agg_method == '[sum(a*b)/sum(b)]/[sum(a*c)/sum(c)]':
+            b = group[y_b]
+            c = group[y_c]
+            agg_result = ((a * b).sum() / b.sum())/((a * c).sum() / c.sum())
+    except ZeroDivisionError:
+        return pd.DataFrame({y_a: [None]})
+    if wdg_range == 'Within Series':
+        return pd.DataFrame({y_a: [agg_result], 'range_min': [a.min()], 'range_max': [a.max()]})
+    else:
+        return pd.DataFrame({y_a: [agg_result]})
+
+
+def make_source(n_groups=2000, rows_per_group=20):
+    '''
+    Build a synthetic dataframe with categorical and integer group columns and three value columns.
+    '''
+    n_rows = n_groups * rows_per_group
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'scenario': pd.Categorical(rng.integers(0, 4, n_rows).astype(str)),
+        'tech': pd.Categorical(rng.integers(0, n_groups // 100 + 1, n_rows).astype(str)),
+        'year': rng.integers(0, 100, n_rows),
+        'a': rng.random(n_rows),
+        'b': rng.random(n_rows),
+        'c': rng.random(n_rows),
+    })
+
+
+@pytest.mark.parametrize('wdg_range', ['No', 'Within Series'])
+@pytest.mark.parametrize('agg_method', core.AGGREGATIONS[1:] + ['sum(a*b)/sum(c)'])
+def test_aggregate_groups_matches_apply(agg_method, wdg_range):
+    df = make_source()
+    groupby_cols = ['scenario', 'tech', 'year']
+    start = time.perf_counter()
+    df_apply = df.groupby(groupby_cols, sort=False, observed=True).apply(apply_aggregation, agg_method, 'a', 'b', 'c', wdg_range).reset_index()
+    df_apply.drop(df_apply.columns[len(groupby_cols)], axis=1, inplace=True)
+    t_apply = time.perf_counter() - start
+    start = time.perf_counter()
+    df_vect = core.aggregate_groups(df, groupby_cols, agg_method, 'a', 'b', 'c', wdg_range)
+    t_vect = time.perf_counter() - start
+    print(agg_method + ', range ' + wdg_range + ' on ' + str(len(df)) + ' rows: apply ' + '{:.2f}'.format(t_apply) +
+        ' s, vectorized ' + '{:.3f}'.format(t_vect) + ' s (' + '{:.0f}'.format(t_apply / t_vect) + 'x)')
+    pd.testing.assert_frame_equal(df_apply, df_vect)
@@ -0,0 +1,57 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import reeds_bokeh as rb
+
+
+def clean_src_reference(df_src):
+    '''
+    Cleaning of get_src sources in full passes over the dataframe, as get_src did before clean_src.
+    Reference implementation that clean_src must match.
+    '''
+    df_src.replace('Eps',0, inplace=True)
+    df_src.replace('Undf',0, inplace=True)
+    df_src = df_src.apply(pd.to_numeric, errors='ignore')
+    df_src = rb.df_to_lowercase(df_src)
+    return df_src
+
+
+def write_hourly_gen(filepath, n_hours=8760, n_techs=20, n_regions=10):
+    '''
+    Write a synthetic hourly generation csv with 'Eps' values, and return its columns.
+    '''
+    hours = pd.date_range('2030-01-01', periods=n_hours, freq='h')
+    idx = pd.MultiIndex.from_product([['Tech_' + str(t) for t in range(n_techs)], ['P' + str(r) for r in range(n_regions)], range(n_hours)])
+    df = pd.DataFrame({'tech': idx.get_level_values(0), 'rb': idx.get_level_values(1)})
+    hour_idx = idx.get_level_values(2)
+    for col, values in [('year', hours.year), ('month', hours.month), ('day', hours.day), ('hour', hours.hour)]:
+        df[col] = np.asarray(values)[hour_idx]
+    df['Generation (GW)'] = np.random.default_rng(0).random(len(df)).round(6).astype(object)
+    df.loc[df.index % 97 == 0, 'Generation (GW)'] = 'Eps'
+    df.to_csv(filepath, index=False)
+    return ['tech', 'rb', 'year', 'month', 'day', 'hour', 'Generation (GW)']
+
+
+def test_read_src_matches_reference(tmp_path, monkeypatch):
+    monkeypatch.setattr(rb, 'reeds', rb.rd2)
+    filepath = os.path.join(str(tmp_path), 'gen_h.csv')
+    columns = write_hourly_gen(filepath)
+    start = time.perf_counter()
+    df_ref = pd.read_csv(filepath, low_memory=False)
+    df_ref.columns = columns
+    df_ref = clean_src_reference(df_ref)
+    t_ref = time.perf_counter() - start
+    start = time.perf_counter()
+    df_new = rb.read_src(filepath, None, {'file': 'gen_h.csv', 'columns': columns})
+    t_new = time.perf_counter() - start
+    print('read and clean of ' + str(len(df_new)) + ' rows: reference ' + '{:.2f}'.format(t_ref) + ' s, single pass ' +
+        '{:.2f}'.format(t_new) + ' s (' + '{:.1f}'.format(t_ref / t_new) + 'x)')
+    pd.testing.assert_frame_equal(df_ref, df_new)
+
+
+def test_clean_src_matches_reference():
+    df = pd.DataFrame({'tech': ['Wind', 'GAS', np.nan, 'Eps'], 'value': ['1.5', 'Eps', 'Undf', np.nan], 'year': [2030, 2030, 2040, 2040]})
+    pd.testing.assert_frame_equal(clean_src_reference(df.copy()), rb.clean_src(df.copy()))
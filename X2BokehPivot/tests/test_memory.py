@@ -0,0 +1,84 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import core
+
+N_ROWS = 200000
+#Columns of the source that no widget uses. set_df_plots must only copy them along with the rows it keeps, so the
+#peak memory it allocates grows with them only by the copies of the kept rows it needs.
+N_UNUSED_COLS = 10
+#Allowed growth of the peak beyond the needed copies, as a share of the memory of the unused columns. Half a copy
+#leaves room for temporaries, while a stage that copied the whole source once more would exceed it.
+MARGIN = 0.5
+
+BASE_CONFIG = {'x': 'year', 'y': 'value', 'y_agg': 'sum(a)', 'chart_type': 'Bar'}
+
+
+def make_source(n_unused_cols):
+    '''
+    Build a synthetic source with categorical discrete columns and n_unused_cols float columns that no widget uses,
+    and its cols dict.
+    '''
+    rng = np.random.default_rng(0)
+    df_source = pd.DataFrame({
+        'scenario': rng.integers(0, 4, N_ROWS).astype(str),
+        'tech': rng.integers(0, 20, N_ROWS).astype(str),
+        'rb': rng.integers(0, 100, N_ROWS).astype(str),
+        'year': rng.integers(2020, 2051, N_ROWS),
+        'value': rng.random(N_ROWS),
+    })
+    for i in range(n_unused_cols):
+        df_source['unused_' + str(i)] = rng.random(N_ROWS)
+    cols = {}
+    cols['all'] = df_source.columns.values.tolist()
+    cols['discrete'] = ['scenario', 'tech', 'rb']
+    cols['continuous'] = [c for c in cols['all'] if c not in cols['discrete']]
+    cols['x-axis'] = cols['all']
+    cols['y-axis'] = cols['continuous']
+    cols['filterable'] = cols['discrete'] + ['year']
+    cols['seriesable'] = cols['filterable']
+    core.categorize_discrete(df_source, cols['discrete'])
+    return df_source, cols
+
+
+def peak_memory(df_source, cols, config):
+    '''
+    Return the peak memory allocated by set_df_plots, as traced by tracemalloc, with every stage run, and the
+    share of the rows of df_source that the filters keep.
+    '''
+    wdg = core.build_widgets(df_source, cols, init_load=True, init_config=dict(BASE_CONFIG, **config), wdg_defaults={})
+    kept = len(core.filter_df_plots(df_source, cols, wdg, {})) / len(df_source)
+    core.clear_pipeline_cache()
+    tracemalloc.start()
+    try:
+        core.set_df_plots(df_source, cols, wdg)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        core.clear_pipeline_cache()
+    return peak, kept
+
+
+#Copies of the kept rows each configuration needs: the filter stage copies the rows it keeps, and without
+#aggregation the scale stage, the net levels merge and the sort stage each build a frame of all columns.
+@pytest.mark.parametrize('config, copies', [
+    ({'series': 'tech'}, 0),
+    ({'series': 'tech', 'filter_1': list(range(10))}, 1),
+    ({'series': 'tech', 'x': 'rb', 'explode': 'scenario', 'cum_sort': 'Descending'}, 0),
+    ({'series': 'tech', 'explode': 'scenario', 'adv_op': 'Difference', 'adv_col': 'scenario', 'adv_col_base': '0'}, 0),
+    ({'series': 'tech', 'y_agg': 'None'}, 3),
+    ({'series': 'tech', 'y_agg': 'None', 'filter_0': [0, 1]}, 4),
+], ids=['no filter', 'filter', 'explode', 'difference', 'no aggregation', 'no aggregation filter'])
+def test_set_df_plots_peak_memory(config, copies):
+    df_small, cols_small = make_source(0)
+    df_wide, cols_wide = make_source(N_UNUSED_COLS)
+    unused_bytes = df_wide.memory_usage(deep=True).sum() - df_small.memory_usage(deep=True).sum()
+    peak_small, kept = peak_memory(df_small, cols_small, config)
+    peak_wide, _ = peak_memory(df_wide, cols_wide, config)
+    growth = (peak_wide - peak_small) / unused_bytes
+    print('peak ' + '{:.1f}'.format(peak_small / 1e6) + ' MB, ' + '{:.1f}'.format(peak_wide / 1e6) + ' MB with ' +
+        '{:.1f}'.format(unused_bytes / 1e6) + ' MB of unused columns (' + '{:.2f}'.format(growth) + ' copies of them)')
+    assert growth <= copies * kept + MARGIN
@@ -0,0 +1,14 @@
+'''
+Prebuild the on-disk cache of cleaned sources (outputs/.bokehpivot_cache/) for every scenario found under one or
+more runs folders, so that new bokeh sessions and reports load them without parsing the csv files again.
+
+Usage: python warm_cache.py <runs folder> [<runs folder> ...]
+'''
+import sys
+import reeds_bokeh as rb
+
+if len(sys.argv) < 2:
+    print(__doc__)
+    sys.exit(1)
+for runs_path in sys.argv[1:]:
+    rb.warm_src_cache(runs_path)
@@ -0,0 +1,121 @@
+import os
+import json
+import hashlib
+
+# Name of the manifest file in the output folder
+MANIFEST_FILE = 'manifest.json'
+
+# Block size in bytes used when hashing solution zips
+HASH_BUFFER_SIZE = 1024 * 1024
+
+def empty_manifest():
+    """
+    Return a manifest with no solutions or outputs recorded.
+
+    'solutions' maps each solution zip path to its size, mtime and sha256. 'outputs' maps each output file path,
+    relative to the output folder, to the sha256 of its solution, the settings it was extracted with, its row
+    count and its size.
+    """
+    return {'solutions': {}, 'outputs': {}}
+
+def load_manifest(output_folder, manifest_file=MANIFEST_FILE):
+    """
+    Load the manifest of an output folder, or an empty manifest if there is none or it cannot be read.
+    manifest_file is relative to the output folder.
+    """
+    manifest_path = os.path.join(output_folder, manifest_file)
+    if not os.path.exists(manifest_path):
+        return empty_manifest()
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        return {'solutions': manifest.get('solutions', {}), 'outputs': manifest.get('outputs', {})}
+    except Exception as e:
+        print(f"Could not read {manifest_path}, all outputs will be extracted again: {e}")
+        return empty_manifest()
+
+def save_manifest(output_folder, manifest, manifest_file=MANIFEST_FILE):
+    """
+    Write the manifest of an output folder, replacing the previous one in a single step.
+    manifest_file is relative to the output folder.
+    """
+    manifest_path = os.path.join(output_folder, manifest_file)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+def update_manifest(manifest, updates):
+    """
+    Apply the solution and output records returned by process_solution to a manifest.
+    Outputs recorded as None are removed.
+    """
+    manifest['solutions'].update(updates['solutions'])
+    for key, record in updates['outputs'].items():
+        if record is None:
+            manifest['outputs'].pop(key, None)
+        else:
+            manifest['outputs'][key] = record
+
+def solution_key(sol_file_path):
+    """
+    Key of a solution zip in the manifest.
+    """
+    return os.path.normpath(sol_file_path).replace(os.sep, '/')
+
+def output_key(output_folder, output_file):
+    """
+    Key of an output file in the manifest: its path relative to the output folder.
+    """
+    return os.path.relpath(output_file, output_folder).replace(os.sep, '/')
+
+def file_sha256(path):
+    """
+    Return the sha256 hex digest of a file, read in blocks.
+    """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def solution_fingerprint(sol_file_path, manifest):
+    """
+    Return the size, mtime and sha256 of a solution zip. The zip is only hashed if its size or mtime differ
+    from the ones recorded in the manifest.
+
+    Args:
+    - sol_file_path: Path to the solution zip file.
+    - manifest: Manifest from load_manifest.
+
+    Returns:
+    - fingerprint: Dict with 'size', 'mtime' and 'sha256'.
+    """
+    stat = os.stat(sol_file_path)
+    previous = manifest['solutions'].get(solution_key(sol_file_path))
+    if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime_ns:
+        return previous
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': file_sha256(sol_file_path)}
+
+def is_up_to_date(manifest, output_folder, output_file, sha256, settings):
+    """
+    Check if an output file exists as it was written by an earlier extraction of the same solution with the
+    same settings.
+
+    Args:
+    - manifest: Manifest from load_manifest.
+    - output_folder: Path to the output folder.
+    - output_file: Path to the output file.
+    - sha256: sha256 of the solution zip.
+    - settings: Extraction settings of the output file (collection/property entries, period, backend, format).
+    """
+    record = manifest['outputs'].get(output_key(output_folder, output_file))
+    return (record is not None and record['sha256'] == sha256 and record['settings'] == settings
+            and os.path.isfile(output_file) and os.path.getsize(output_file) == record['size'])
+
+def output_record(output_file, sol_file_path, sha256, settings, rows):
+    """
+    Return the manifest record of an output file that has just been written.
+    """
+    return {'solution': solution_key(sol_file_path), 'sha256': sha256, 'settings': settings, 'rows': rows,
+            'size': os.path.getsize(output_file)}
@@ -112,6 +112,7 @@ def create_mapping(df, collection_mapping):
     selected_collection_ids = [list(collection_map.keys())[i] for i in selected_indices]
     
     mapping = {}
+    output_names = set()
     # For each selected collection_id, let the user select properties
     for cid in selected_collection_ids:
         cname = collection_map[cid]
@@ -132,8 +133,20 @@ def create_mapping(df, collection_mapping):
         selected_props = input(f"Enter the numbers of the properties you want to select for '{cname}' (e.g., 1,3,5): ")
         selected_prop_indices = [int(x.strip()) - 1 for x in selected_props.split(',')]
         selected_enum_ids = [list(property_map.keys())[i] for i in selected_prop_indices]
+        # Ask for the output file name of each property. Reusing a name appends to that output file.
+        entries = {}
+        for eid in selected_enum_ids:
+            default_name = f"collection_{cid}_property_{eid}"
+            output_name = input(f"Output file name for '{property_map[eid]}', without extension (default: {default_name}): ").strip()
+            output_name = output_name or default_name
+            entry = {'output': output_name}
+            if output_name in output_names:
+                entry['mode'] = 'append'
+                print(f"'{property_map[eid]}' will be appended to {output_name}")
+            output_names.add(output_name)
+            entries[str(eid)] = entry
         # Save to mapping
-        mapping[str(cid)] = selected_enum_ids  # Use str(cid) to make JSON keys strings
+        mapping[str(cid)] = entries  # Use str(cid) to make JSON keys strings
     
     # Save the mapping to mappings.json
     mapping_path = os.path.join(os.path.dirname(__file__), 'mappings.json')
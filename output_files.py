@@ -0,0 +1,298 @@
+import os
+import shutil
+import pandas as pd
+
+# Block size in bytes used when copying CSV data rows
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Rows per record batch (and row group) used when rewriting Parquet files
+BATCH_ROWS = 1024 * 1024
+
+def read_output(path):
+    """
+    Read an output file written as CSV, Parquet or Feather, based on its extension.
+    """
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    if path.endswith('.feather'):
+        return pd.read_feather(path)
+    return pd.read_csv(path)
+
+def write_output(df, path):
+    """
+    Write an output DataFrame in the format given by the extension of path.
+    """
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    elif path.endswith('.feather'):
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+
+def read_csv_header(path):
+    """
+    Return the header line of a CSV file, without its line terminator.
+    """
+    with open(path, 'rb') as f:
+        return f.readline().rstrip(b'\r\n')
+
+def check_csv_header(path, columns):
+    """
+    Raise a ValueError if the header of the CSV file at path is not the list of columns.
+    """
+    header = read_csv_header(path).decode()
+    if header.split(',') != list(columns):
+        raise ValueError(f"Header of {path} is '{header}', expected '{','.join(columns)}'")
+
+def append_csv(source_path, target_path):
+    """
+    Append the data rows of a CSV file to the end of another one with the same header, in constant memory.
+
+    Args:
+    - source_path: CSV file whose data rows are appended.
+    - target_path: CSV file appended to.
+    """
+    source_header = read_csv_header(source_path)
+    target_header = read_csv_header(target_path)
+    if source_header != target_header:
+        raise ValueError(f"Header of {source_path} '{source_header.decode()}' does not match "
+                         f"header of {target_path} '{target_header.decode()}'")
+    with open(source_path, 'rb') as source, open(target_path, 'rb+') as target:
+        source.readline()
+        # Terminate the last row of the target if needed
+        target.seek(0, os.SEEK_END)
+        if target.tell() > 0:
+            target.seek(-1, os.SEEK_END)
+            if target.read(1) != b'\n':
+                target.write(b'\n')
+        shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+
+def check_schema(source_schema, target_schema, source_path, target_path):
+    """
+    Raise a ValueError if two Arrow schemas do not have the same column names and value types.
+    Dictionary (categorical) columns are compared by their value type, and string and large_string are equivalent.
+    Columns of null type (empty object columns) match any type.
+    """
+    import pyarrow as pa
+
+    def value_type(data_type):
+        if pa.types.is_dictionary(data_type):
+            data_type = data_type.value_type
+        return pa.string() if pa.types.is_large_string(data_type) else data_type
+
+    if source_schema.names != target_schema.names:
+        raise ValueError(f"Columns of {source_path} {source_schema.names} do not match columns of {target_path} {target_schema.names}")
+    for source_field, target_field in zip(source_schema, target_schema):
+        if pa.types.is_null(value_type(source_field.type)):
+            continue
+        if value_type(source_field.type) != value_type(target_field.type):
+            raise ValueError(f"Column '{source_field.name}' of {source_path} is {source_field.type}, "
+                             f"expected {target_field.type} as in {target_path}")
+
+def append_parquet(batches, schema, source_path, target_path, batch_rows=BATCH_ROWS):
+    """
+    Rewrite a Parquet file with record batches appended, one batch of at most batch_rows rows at a time.
+
+    Args:
+    - batches: Iterable of pyarrow RecordBatch to append.
+    - schema: Arrow schema of the batches.
+    - source_path: Name of the data being appended, for error messages.
+    - target_path: Parquet file appended to.
+    - batch_rows: Number of rows of the target read at a time.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    target_file = pq.ParquetFile(target_path)
+    target_schema = target_file.schema_arrow
+    check_schema(schema, target_schema, source_path, target_path)
+    tmp_path = target_path + '.tmp'
+    try:
+        with pq.ParquetWriter(tmp_path, target_schema) as writer:
+            for batch in target_file.iter_batches(batch_size=batch_rows):
+                writer.write_table(pa.Table.from_batches([batch]).cast(target_schema))
+            for batch in batches:
+                writer.write_table(pa.Table.from_batches([batch]).cast(target_schema))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    target_file.close()
+    os.replace(tmp_path, target_path)
+
+def append_feather(table, source_path, target_path):
+    """
+    Rewrite a Feather file with an Arrow table appended.
+
+    The Feather (Arrow IPC) file format needs a single dictionary per categorical column, so unlike CSV and Parquet
+    the target is loaded as a memory-mapped table and its dictionaries are unified with the appended rows.
+
+    Args:
+    - table: pyarrow Table to append.
+    - source_path: Name of the data being appended, for error messages.
+    - target_path: Feather file appended to.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    with pa.memory_map(target_path) as source:
+        target_table = pa.ipc.open_file(source).read_all()
+    check_schema(table.schema, target_table.schema, source_path, target_path)
+    combined = pa.concat_tables([target_table, table.cast(target_table.schema)]).unify_dictionaries()
+    tmp_path = target_path + '.tmp'
+    try:
+        feather.write_feather(combined.combine_chunks(), tmp_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    del target_table, combined
+    os.replace(tmp_path, target_path)
+
+def append_feather_batches(source_path, target_path):
+    """
+    Rewrite a Feather file with the record batches of another one appended, one batch at a time, when neither file
+    has dictionary (categorical) columns. Otherwise the dictionaries must be unified, and both files are loaded
+    by append_feather.
+
+    Args:
+    - source_path: Feather file whose rows are appended.
+    - target_path: Feather file appended to.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    with pa.memory_map(source_path) as source_map, pa.memory_map(target_path) as target_map:
+        source = pa.ipc.open_file(source_map)
+        target = pa.ipc.open_file(target_map)
+        check_schema(source.schema, target.schema, source_path, target_path)
+        if any(pa.types.is_dictionary(field.type) for field in list(source.schema) + list(target.schema)):
+            source, target = None, None
+        else:
+            tmp_path = target_path + '.tmp'
+            try:
+                # Same compression as pyarrow.feather.write_feather
+                with pa.ipc.new_file(tmp_path, target.schema, options=pa.ipc.IpcWriteOptions(compression='lz4')) as writer:
+                    for i in range(target.num_record_batches):
+                        writer.write_batch(target.get_batch(i))
+                    for i in range(source.num_record_batches):
+                        writer.write_table(pa.Table.from_batches([source.get_batch(i)]).cast(target.schema))
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+    if source is None:
+        append_feather(feather.read_table(source_path), source_path, target_path)
+    else:
+        os.replace(tmp_path, target_path)
+
+def append_output(source_path, target_path, batch_rows=BATCH_ROWS):
+    """
+    Append the rows of an output file to another output file of the same format and columns.
+
+    CSV data rows are copied in blocks after checking the headers match, and Parquet files are rewritten at most
+    batch_rows rows at a time, so neither file is loaded into memory. Feather files are rewritten one record batch
+    at a time unless they have categorical columns (see append_feather_batches).
+
+    Args:
+    - source_path: Output file whose rows are appended.
+    - target_path: Output file appended to.
+    - batch_rows: Number of Parquet rows read at a time.
+    """
+    if source_path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        source_file = pq.ParquetFile(source_path)
+        append_parquet(source_file.iter_batches(batch_size=batch_rows), source_file.schema_arrow, source_path, target_path,
+                       batch_rows)
+    elif source_path.endswith('.feather'):
+        append_feather_batches(source_path, target_path)
+    else:
+        append_csv(source_path, target_path)
+
+def concat_outputs(source_paths, target_path, append=False):
+    """
+    Write the rows of several output files of the same format and columns, in order, to one output file.
+
+    CSV files are copied in blocks and Parquet files one batch at a time, so no file is loaded into memory.
+
+    Args:
+    - source_paths: List of output files whose rows are written.
+    - target_path: Output file written.
+    - append: Append the rows to target_path if it exists instead of overwriting it.
+    """
+    append = append and os.path.exists(target_path)
+    if target_path.endswith('.csv'):
+        if not append:
+            shutil.copyfile(source_paths[0], target_path)
+            source_paths = source_paths[1:]
+        for source_path in source_paths:
+            append_csv(source_path, target_path)
+        return
+
+    import pyarrow as pa
+
+    if append:
+        source_paths = [target_path] + list(source_paths)
+    tmp_path = target_path + '.tmp'
+    try:
+        if target_path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+
+            schema = pq.ParquetFile(source_paths[0]).schema_arrow
+            with pq.ParquetWriter(tmp_path, schema) as writer:
+                for source_path in source_paths:
+                    source_file = pq.ParquetFile(source_path)
+                    check_schema(source_file.schema_arrow, schema, source_path, target_path)
+                    for batch in source_file.iter_batches(batch_size=BATCH_ROWS):
+                        writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+        else:
+            import pyarrow.feather as feather
+
+            tables = [feather.read_table(source_path) for source_path in source_paths]
+            for source_path, table in zip(source_paths[1:], tables[1:]):
+                check_schema(table.schema, tables[0].schema, source_path, target_path)
+            combined = pa.concat_tables([table.cast(tables[0].schema) for table in tables]).unify_dictionaries()
+            feather.write_feather(combined.combine_chunks(), tmp_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, target_path)
+
+def open_table_writer(path, schema):
+    """
+    Open a writer that streams Arrow tables of a fixed schema to a new Parquet or Feather file, based on the
+    extension of path. Each table written is flushed as a row group (Parquet) or record batch (Feather).
+
+    The Feather (Arrow IPC) file format needs the dictionaries of categorical columns to be known before the first
+    batch, so streamed Feather files should use plain string columns in schema.
+
+    Returns:
+    - writer: Object with write_table(table) and close() methods.
+    """
+    import pyarrow as pa
+
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(path, schema)
+    # Same compression as pyarrow.feather.write_feather
+    return pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression='lz4'))
+
+def append_frame(df, target_path):
+    """
+    Append the rows of a DataFrame to an existing Parquet or Feather output file, without writing
+    an intermediate file.
+
+    Args:
+    - df: DataFrame with the columns of the target.
+    - target_path: Parquet or Feather file appended to.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if target_path.endswith('.parquet'):
+        append_parquet(table.to_batches(), table.schema, 'appended rows', target_path)
+    else:
+        append_feather(table, 'appended rows', target_path)
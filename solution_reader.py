@@ -0,0 +1,423 @@
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+import numpy as np
+import pandas as pd
+from xml.etree import ElementTree as ET
+
+# Namespace used by every table in a PLEXOS Solution.xml
+SOLUTION_NS = '{http://tempuri.org/SolutionDataset.xsd}'
+
+# PeriodEnum names used by the .NET API mapped to the period_type_id of t_key_index / t_data_<id>.BIN
+PERIOD_TYPE_IDS = {'Interval': 0, 'Day': 1, 'Week': 2, 'Month': 3, 'FiscalYear': 4}
+
+# Column of t_period_0 that links each interval to the period of a coarser period type
+PERIOD_ID_COLUMNS = {1: 'day_id', 2: 'week_id', 3: 'month_id', 4: 'fiscal_year_id'}
+
+# SimulationPhaseEnum names mapped to phase_id of t_key / t_phase_<id>
+PHASE_IDS = {'LTPlan': 1, 'PASA': 2, 'MTSchedule': 3, 'STSchedule': 4}
+
+# Tables of Solution.xml needed to resolve a collection/property query
+SOLUTION_TABLES = ['t_key', 't_key_index', 't_membership', 't_object', 't_category', 't_property', 't_period_0',
+                   't_phase_1', 't_phase_2', 't_phase_3', 't_phase_4']
+
+def find_solution_xml(zf):
+    """
+    Return the name of the Solution.xml member of an open solution zip, or None if there is none.
+    """
+    for name in zf.namelist():
+        if name.endswith("Solution.xml"):
+            return name
+    return None
+
+def parse_datetimes(datetime_strs):
+    """
+    Vectorized parse of PLEXOS 'dd/mm/yyyy HH:MM:SS' strings into a datetime64[s] array.
+
+    Args:
+    - datetime_strs: Sequence of datetime strings from t_period_0.
+
+    Returns:
+    - datetime64[s] NumPy array (NaT where a string could not be parsed).
+    """
+    parsed = pd.to_datetime(pd.Series(datetime_strs, dtype=object), format='%d/%m/%Y %H:%M:%S', errors='coerce')
+    return parsed.values.astype('datetime64[s]')
+
+def split_datetimes(dates):
+    """
+    Split a datetime64 array into integer year, month, day and hour arrays.
+    """
+    dates = np.asarray(dates, dtype='datetime64[s]')
+    years = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+    months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    days = (dates.astype('datetime64[D]') - dates.astype('datetime64[M]')).astype(np.int64) + 1
+    hours = (dates.astype('datetime64[h]') - dates.astype('datetime64[D]')).astype(np.int64)
+    return years, months, days, hours
+
+def scan_period_datetimes(xml_fp, table_name='t_period_0'):
+    """
+    Stream Solution.xml and return the datetime strings of a period table, stopping as soon as the table ends
+    instead of building the whole document tree.
+
+    Args:
+    - xml_fp: File object for Solution.xml.
+    - table_name: Name of the period table.
+
+    Returns:
+    - datetime_strs: List of datetime strings, in file order.
+    """
+    row_tag = SOLUTION_NS + table_name
+    datetime_tag = SOLUTION_NS + 'datetime'
+    datetime_strs = []
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(xml_fp, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                root = elem
+            elif depth == 2 and elem.tag != row_tag and datetime_strs:
+                # First row of the next table: the period table is complete
+                break
+        else:
+            depth -= 1
+            if depth == 1:
+                if elem.tag == row_tag:
+                    datetime_strs.append(elem.findtext(datetime_tag))
+                root.clear()
+    return datetime_strs
+
+def read_solution_tables(xml_fp, table_names=SOLUTION_TABLES):
+    """
+    Stream Solution.xml and collect the requested tables as dicts of NumPy arrays.
+
+    Args:
+    - xml_fp: File object for Solution.xml.
+    - table_names: Names of the tables to collect.
+
+    Returns:
+    - tables: Dict mapping table name to a dict of column name -> NumPy array (strings, or int64 for *_id columns).
+    """
+    wanted = {SOLUTION_NS + name: name for name in table_names}
+    rows = {name: [] for name in table_names}
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(xml_fp, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                root = elem
+        else:
+            depth -= 1
+            if depth == 1:
+                # Completed row of any table: keep it if wanted, then drop all processed rows from the root
+                name = wanted.get(elem.tag)
+                if name is not None:
+                    rows[name].append({child.tag[len(SOLUTION_NS):]: child.text for child in elem})
+                root.clear()
+    tables = {}
+    for name, table_rows in rows.items():
+        columns = {}
+        for row in table_rows:
+            for col in row:
+                columns.setdefault(col, None)
+        table = {}
+        for col in columns:
+            values = [row.get(col) for row in table_rows]
+            if col.endswith('_id') or col in ['position', 'length', 'period_offset', 'rank']:
+                table[col] = np.array([int(v) if v is not None else -1 for v in values], dtype=np.int64)
+            else:
+                table[col] = np.array(values, dtype=object)
+        tables[name] = table
+    return tables
+
+def lookup(keys, values, query, default=-1):
+    """
+    Vectorized dictionary lookup: for each element of query, return values[keys == element], or default if missing.
+    """
+    out = np.full(len(query), default, dtype=values.dtype if len(values) else np.int64)
+    if len(keys) == 0 or len(query) == 0:
+        return out
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    pos = np.searchsorted(sorted_keys, query)
+    pos_clipped = np.minimum(pos, len(sorted_keys) - 1)
+    found = sorted_keys[pos_clipped] == query
+    out[found] = values[order[pos_clipped[found]]]
+    return out
+
+class ZipSolution(object):
+    """
+    Pure-Python reader for PLEXOS solution zip files. It exposes the same Connection/Close lifecycle as
+    PLEXOS_NET.Core.Solution so it can be used as an alternative extraction backend, but decodes Solution.xml
+    and the t_data_<period_type_id>.BIN files directly into NumPy arrays, without .NET or a PLEXOS licence.
+    """
+    def __init__(self):
+        self.sol_file = None
+        self.tables = None
+        self.interval_datetimes = None
+        self._data = {}
+        self._temp_files = []
+
+    def Connection(self, sol_file):
+        """
+        Open a solution zip and parse the metadata tables of its Solution.xml.
+        """
+        self.Close()
+        with zipfile.ZipFile(sol_file) as zf:
+            xml_file = find_solution_xml(zf)
+            if not xml_file:
+                raise ValueError(f"No XML file found in {sol_file}")
+            with zf.open(xml_file) as xml_fp:
+                self.tables = read_solution_tables(xml_fp)
+        self.sol_file = sol_file
+        self.interval_datetimes = parse_datetimes(self.tables['t_period_0'].get('datetime', []))
+
+    def Close(self):
+        self.sol_file = None
+        self.tables = None
+        self.interval_datetimes = None
+        self._data = {}
+        for temp_file in self._temp_files:
+            try:
+                os.remove(temp_file)
+            except OSError:
+                # On Windows a file cannot be removed while an unfinished query still maps it
+                print(f"Could not remove temporary file {temp_file}")
+        self._temp_files = []
+
+    def period_data(self, period_type_id):
+        """
+        Return the float64 values of t_data_<period_type_id>.BIN as an array mapped from disk, so that a query only
+        reads the values it gathers into memory. A member stored uncompressed is mapped where it lies in the solution
+        zip, and a compressed one is extracted once per connection to a temporary file, removed by Close.
+        """
+        if period_type_id not in self._data:
+            self._data[period_type_id] = self.map_period_data(period_type_id)
+        return self._data[period_type_id]
+
+    def map_period_data(self, period_type_id):
+        """
+        Map the float64 values of t_data_<period_type_id>.BIN from disk. See period_data.
+        """
+        with zipfile.ZipFile(self.sol_file) as zf:
+            info = next((i for i in zf.infolist() if os.path.basename(i.filename) == f't_data_{period_type_id}.BIN'), None)
+            if info is None or info.file_size < 8:
+                return np.array([], dtype='<f8')
+            if info.compress_type == zipfile.ZIP_STORED:
+                # The data follows the 30 byte local file header, the file name and the extra field
+                with open(self.sol_file, 'rb') as f:
+                    f.seek(info.header_offset)
+                    header = f.read(30)
+                if header[:4] != b'PK\x03\x04':
+                    raise ValueError(f"Bad local file header of {info.filename} in {self.sol_file}")
+                name_length, extra_length = struct.unpack('<HH', header[26:30])
+                return np.memmap(self.sol_file, dtype='<f8', mode='r', offset=info.header_offset + 30 + name_length + extra_length,
+                                 shape=(info.file_size // 8,))
+            with tempfile.NamedTemporaryFile(prefix=f't_data_{period_type_id}_', suffix='.BIN', delete=False) as temp_fp:
+                self._temp_files.append(temp_fp.name)
+                with zf.open(info) as member_fp:
+                    shutil.copyfileobj(member_fp, temp_fp, 1024 * 1024)
+        return np.memmap(temp_fp.name, dtype='<f8', mode='r', shape=(info.file_size // 8,))
+
+    def period_datetimes(self, period_type_id, phase_id):
+        """
+        Return (period_ids, datetimes) describing the timestamps of each period of a period type.
+        Interval data is expanded to every interval in the phase's period -> interval mapping, and coarser
+        periods are stamped with the first interval they contain.
+        """
+        t_period_0 = self.tables['t_period_0']
+        interval_ids = t_period_0['interval_id']
+        if period_type_id == 0:
+            phase = self.tables.get(f't_phase_{phase_id}', {})
+            if len(phase.get('interval_id', [])):
+                interval_pos = lookup(interval_ids, np.arange(len(interval_ids)), phase['interval_id'])
+                keep = interval_pos >= 0
+                return phase['period_id'][keep], self.interval_datetimes[interval_pos[keep]]
+            return interval_ids, self.interval_datetimes
+        period_col = t_period_0[PERIOD_ID_COLUMNS[period_type_id]]
+        order = np.lexsort((self.interval_datetimes, period_col))
+        first = np.r_[True, period_col[order][1:] != period_col[order][:-1]]
+        return period_col[order][first], self.interval_datetimes[order][first]
+
+    def query(self, collection_id, property_id, period_enum_value='Interval', phase='LTPlan', date_from=None, date_to=None):
+        """
+        Query the category-aggregated (summed) values of one property of one collection.
+
+        Args:
+        - collection_id: Collection ID as used in mappings.json.
+        - property_id: Property enum ID as used in mappings.json.
+        - period_enum_value: 'Interval', 'Day', 'Week', 'Month' or 'FiscalYear'.
+        - phase: Simulation phase name, e.g. 'LTPlan'.
+        - date_from: Optional datetime; periods before it are dropped.
+        - date_to: Optional datetime; periods after it are dropped.
+
+        Returns:
+        - result: Dict of NumPy arrays 'category_name' (object), 'datetime' (datetime64[s]) and 'value' (float64), sorted by datetime then category.
+        """
+        blocks = list(self.query_blocks(collection_id, property_id, period_enum_value, phase, date_from, date_to))
+        if len(blocks) == 1:
+            return blocks[0]
+        return {'category_name': np.concatenate([np.array([], dtype=object)] + [b['category_name'] for b in blocks]),
+                'datetime': np.concatenate([np.array([], dtype='datetime64[s]')] + [b['datetime'] for b in blocks]),
+                'value': np.concatenate([np.array([], dtype=np.float64)] + [b['value'] for b in blocks])}
+
+    def query_keys(self, collection_id, property_id, period_type_id, phase_id):
+        """
+        Locate the blocks of values of one property of one collection in t_data_<period_type_id>.BIN.
+
+        Returns:
+        - keys: Tuple of arrays (starts, lengths, period_offsets, category_names) with one element per key, or None if
+          the solution has no values for the property.
+        """
+        t_key = self.tables['t_key']
+        t_key_index = self.tables['t_key_index']
+        t_membership = self.tables['t_membership']
+        t_object = self.tables['t_object']
+        t_category = self.tables['t_category']
+        t_property = self.tables['t_property']
+
+        # Resolve the solution's property_id(s) from the collection and property enum IDs
+        prop_mask = (t_property['collection_id'] == int(collection_id)) & (t_property['enum_id'] == int(property_id))
+        prop_ids = t_property['property_id'][prop_mask]
+        if len(prop_ids) == 0:
+            return None
+
+        # Select the keys for this property, phase, first band and first sample
+        key_mask = np.isin(t_key['property_id'], prop_ids) & (t_key['phase_id'] == phase_id)
+        if 'band_id' in t_key:
+            key_mask &= t_key['band_id'] <= 1
+        if 'timeslice_id' in t_key:
+            key_mask &= t_key['timeslice_id'] <= 0
+        if 'sample_id' in t_key and key_mask.any():
+            key_mask &= t_key['sample_id'] == t_key['sample_id'][key_mask].min()
+        # Interval values come from the standard keys; coarser periods from the summary keys when present
+        if 'period_type_id' in t_key:
+            wanted_key_type = 0 if period_type_id == 0 else 1
+            if not (key_mask & (t_key['period_type_id'] == wanted_key_type)).any():
+                wanted_key_type = 1 - wanted_key_type
+            key_mask &= t_key['period_type_id'] == wanted_key_type
+        key_ids = t_key['key_id'][key_mask]
+        membership_ids = t_key['membership_id'][key_mask]
+
+        # Locate each key's block of values in the binary file
+        idx_mask = np.isin(t_key_index['key_id'], key_ids) & (t_key_index['period_type_id'] == period_type_id)
+        idx_key_ids = t_key_index['key_id'][idx_mask]
+        if len(idx_key_ids) == 0:
+            return None
+        starts = t_key_index['position'][idx_mask] // 8
+        lengths = t_key_index['length'][idx_mask]
+        period_offsets = t_key_index['period_offset'][idx_mask]
+
+        # Map key -> membership -> child object -> category name
+        idx_membership = lookup(key_ids, membership_ids, idx_key_ids)
+        child_objects = lookup(t_membership['membership_id'], t_membership['child_object_id'], idx_membership)
+        category_ids = lookup(t_object['object_id'], t_object['category_id'], child_objects)
+        category_pos = lookup(t_category['category_id'], np.arange(len(t_category['category_id'])), category_ids)
+        category_names = np.full(len(category_ids), '', dtype=object)
+        found = category_pos >= 0
+        category_names[found] = t_category['name'][category_pos[found]]
+        return starts, lengths, period_offsets, category_names
+
+    def query_blocks(self, collection_id, property_id, period_enum_value='Interval', phase='LTPlan', date_from=None, date_to=None,
+                     chunk_rows=None):
+        """
+        Yield the result of query in blocks of consecutive timestamps. Each block only gathers the values of the
+        periods of its timestamps, and has at most about chunk_rows timestamps times keys, so neither the values
+        gathered nor the rows of a block grow with the horizon. Timestamps are never split across blocks, so the
+        blocks follow each other in the datetime then category order of query.
+
+        Args:
+        - collection_id, property_id, period_enum_value, phase, date_from, date_to: As for query.
+        - chunk_rows: Optional number of (key, timestamp) pairs per block. All timestamps are in one block if None.
+
+        Yields:
+        - block: Dict of NumPy arrays 'category_name', 'datetime' and 'value', as returned by query.
+        """
+        period_type_id = PERIOD_TYPE_IDS[period_enum_value]
+        phase_id = PHASE_IDS[phase]
+        keys = self.query_keys(collection_id, property_id, period_type_id, phase_id)
+        if keys is None:
+            yield {'category_name': np.array([], dtype=object), 'datetime': np.array([], dtype='datetime64[s]'), 'value': np.array([], dtype=np.float64)}
+            return
+        starts, lengths, period_offsets, category_names = keys
+        data = self.period_data(period_type_id)
+
+        # Timestamps of the periods in the date range, in datetime order
+        ts_period_ids, ts_datetimes = self.period_datetimes(period_type_id, phase_id)
+        keep = np.ones(len(ts_datetimes), dtype=bool)
+        if date_from is not None:
+            keep &= ts_datetimes >= np.datetime64(date_from, 's')
+        if date_to is not None:
+            keep &= ts_datetimes <= np.datetime64(date_to, 's')
+        order = np.flatnonzero(keep)
+        order = order[np.argsort(ts_datetimes[order], kind='stable')]
+        ts_period_ids, ts_datetimes = ts_period_ids[order], ts_datetimes[order]
+
+        window = len(ts_datetimes) if chunk_rows is None else max(1, chunk_rows // max(1, len(lengths)))
+        window_from = 0
+        while True:
+            window_to = min(window_from + window, len(ts_datetimes))
+            if window_to < len(ts_datetimes):
+                # Extend the window to the last timestamp equal to its end
+                window_to = int(np.searchsorted(ts_datetimes, ts_datetimes[window_to - 1], side='right'))
+            block = self.query_window(data, starts, lengths, period_offsets, category_names,
+                                      ts_period_ids[window_from:window_to], ts_datetimes[window_from:window_to])
+            if window_from == 0 or len(block['value']):
+                yield block
+            window_from = window_to
+            if window_from >= len(ts_datetimes):
+                return
+
+    def query_window(self, data, starts, lengths, period_offsets, category_names, ts_period_ids, ts_datetimes):
+        """
+        Sum the values of the keys of a query by category for the periods of a window of timestamps, and expand them
+        to the timestamps. Only the values in the range of period IDs of the window are gathered.
+
+        Returns:
+        - block: Dict of NumPy arrays 'category_name', 'datetime' and 'value', sorted by datetime then category.
+        """
+        # Clip each key's block of values to the period IDs of the window
+        if len(ts_period_ids):
+            first = np.clip(ts_period_ids.min() - 1 - period_offsets, 0, lengths)
+            last = np.clip(ts_period_ids.max() - period_offsets, 0, lengths)
+        else:
+            first = last = np.zeros(len(lengths), dtype=np.int64)
+        counts = last - first
+
+        # Gather the values of all keys in one pass: flat positions into the binary data
+        total = int(counts.sum())
+        block = np.repeat(np.arange(len(counts)), counts)
+        within = np.repeat(first, counts) + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        values = data[np.repeat(starts, counts) + within]
+        period_ids = np.repeat(period_offsets, counts) + within + 1
+
+        # Sum across objects of the same category and period (CategoryAggregation, OperationTypeEnum.SUM)
+        cat_codes, cat_index = np.unique(category_names[block].astype(str), return_inverse=True)
+        period_codes, period_index = np.unique(period_ids, return_inverse=True)
+        group = cat_index.ravel() * len(period_codes) + period_index.ravel()
+        # bincount returns integers when there are no values, e.g. for a window without timestamps
+        sums = np.bincount(group, weights=values, minlength=len(cat_codes) * len(period_codes)).astype(np.float64, copy=False)
+        present = np.bincount(group, minlength=len(cat_codes) * len(period_codes)) > 0
+        group_ids = np.nonzero(present)[0]
+        group_cats = cat_codes[group_ids // len(period_codes)]
+        group_periods = period_codes[group_ids % len(period_codes)]
+        group_values = sums[group_ids]
+
+        # Expand periods to timestamps
+        order = np.argsort(ts_period_ids, kind='stable')
+        ts_period_ids = ts_period_ids[order]
+        ts_datetimes = ts_datetimes[order]
+        lo = np.searchsorted(ts_period_ids, group_periods, side='left')
+        hi = np.searchsorted(ts_period_ids, group_periods, side='right')
+        counts = hi - lo
+        rep = np.repeat(np.arange(len(group_ids)), counts)
+        ts_pos = np.repeat(lo, counts) + (np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts))
+        out_dates = ts_datetimes[ts_pos]
+        out_cats = group_cats[rep].astype(object)
+        out_values = group_values[rep]
+
+        order = np.lexsort((out_cats.astype(str), out_dates))
+        return {'category_name': out_cats[order], 'datetime': out_dates[order], 'value': out_values[order]}
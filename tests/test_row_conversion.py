@@ -0,0 +1,95 @@
+import csv
+import io
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+from Plexos2BokehPivot import net_timestamp, write_net_rows, write_rows
+
+
+def write_net_rows_loop(csvwriter, result):
+    """
+    Write the rows returned by QueryToList one at a time, as Plexos2BokehPivot did before write_net_rows.
+    Reference implementation that write_net_rows must match.
+
+    Args:
+    - csvwriter: csv.writer of the output file.
+    - result: List of rows returned by QueryToList.
+
+    Returns:
+    - rows: Number of rows written.
+    """
+    rows = 0
+    for row in result:
+        row_data = [getattr(row, col, '') for col in ["category_name", "value"]]
+        row_data.insert(1, "p1")  # Add "p1" in the second column
+
+        date_str = str(row._date)
+        date_parts = date_str.split(' ')
+        date_component = date_parts[0].split('/')
+        time_component = date_parts[1].split(':') if len(date_parts) > 1 else [0]
+
+        month = date_component[0]
+        day = date_component[1]
+        year = date_component[2]
+        hour = int(time_component[0])
+
+        if 'PM' in date_str and hour != 12:
+            hour += 12
+        elif 'AM' in date_str and hour == 12:
+            hour = 0
+
+        row_data.insert(2, year)
+        row_data.insert(3, month)
+        row_data.insert(4, day)
+        row_data.insert(5, hour)
+
+        csvwriter.writerow(row_data)
+        rows += 1
+    return rows
+
+
+def synthetic_result(n_rows, categories):
+    """
+    Build synthetic QueryToList rows, with each timestamp repeated once per category.
+    """
+    base = datetime(2030, 1, 1)
+    return [SimpleNamespace(category_name=categories[i % len(categories)], value=float(i) / 3,
+                            _date=net_timestamp(base + timedelta(hours=i // len(categories))))
+            for i in range(n_rows)]
+
+
+def convert(writer, result):
+    """
+    Write result with writer, and return the written text and the rows per second.
+    """
+    buffer = io.StringIO()
+    start = time.perf_counter()
+    writer(csv.writer(buffer) if writer is write_net_rows_loop else buffer, result)
+    return buffer.getvalue(), len(result) / (time.perf_counter() - start)
+
+
+def test_write_net_rows_matches_loop():
+    result = synthetic_result(100000, [f"Category{i}" for i in range(10)])
+    expected, loop_rate = convert(write_net_rows_loop, result)
+    written, batched_rate = convert(write_net_rows, result)
+    print(f"loop {loop_rate:.0f} rows/s, batched {batched_rate:.0f} rows/s")
+    assert written == expected
+
+
+def test_write_net_rows_quotes_categories():
+    categories = ['plain', 'with, comma', 'with "quotes"', 'two\r\nlines', 'one\nline', '']
+    result = synthetic_result(len(categories) * 3, categories)
+    expected, _ = convert(write_net_rows_loop, result)
+    written, _ = convert(write_net_rows, result)
+    assert written == expected
+    rows = list(csv.reader(io.StringIO(written, newline='')))
+    assert [row[0] for row in rows] == [row.category_name for row in result]
+
+
+def test_write_rows_empty():
+    buffer = io.StringIO()
+    assert write_rows(buffer, np.array([], dtype=object), np.array([], dtype='datetime64[s]'), np.array([])) == 0
+    assert buffer.getvalue() == ''